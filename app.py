@@ -1,48 +1,25 @@
+import time
+STARTUP_START = time.perf_counter()  # Startup is timed from here to the first idle main loop.
 import logging
 import threading
 from pathlib import Path
 import os
 import subprocess
 import humanize
-import google.generativeai as genai
 from dotenv import load_dotenv
 import customtkinter as ctk
 from tkinter import filedialog, messagebox, Menu
 import tkinter as tk  # For Toplevel in tour popups
-import heapq
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import time
 import json
-import requests  # For HTTP API calls
 import re  # For regex matching of <think> tags
+import base64
+
+from deepscan import (CategoryIndex, DiskScanner, FileHasher, ResultFilter, ScanCache, ScanResults, ScanSession,
+                      ScanSummary, TreemapLayout, find_duplicates, load_categories)
+from deepscan.llm import ResponseCache, create_provider, load_provider_settings
 
-# Maximum results limit for unbounded mode
-MAX_RESULTS_LIMIT = 100_000
-
-# Known Windows system directories to skip (case-insensitive)
-SYSTEM_DIRS = {
-    "windows",
-    "program files",
-    "program files (x86)",
-    "appdata",
-    "system volume information",
-    "$recycle.bin"
-}
-
-# Ultra-specific file type categories.
-EXTENSION_CATEGORIES = {
-    "Images": {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".svg"},
-    "Videos": {".mp4", ".mkv", ".mov", ".avi", ".wmv", ".flv", ".mpeg", ".mpg", ".3gp", ".webm"},
-    "Audio": {".mp3", ".wav", ".flac", ".aac", ".ogg", ".m4a", ".wma"},
-    "Documents": {".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".ods", ".odp"},
-    "Text": {".txt", ".rtf", ".md", ".log", ".csv"},
-    "Code": {".py", ".js", ".html", ".htm", ".css", ".java", ".c", ".cpp", ".cs", ".rb", ".php", ".sql", ".sh", ".go", ".rs", ".swift", ".kt", ".ts"},
-    "Executables": {".exe", ".msi", ".bat", ".cmd"},
-    "Libraries": {".dll", ".so", ".dylib"},
-    "Archives": {".zip", ".rar", ".7z", ".tar", ".gz", ".iso", ".cab", ".arj", ".lzma", ".xz"},
-    "Others": set()
-}
+# matplotlib (deepscan.charts), google.generativeai and requests are imported on first use:
+# together they take longer to import than the whole window takes to build.
 
 # -------------------- TOOLTIP CLASS (for hover hints) --------------------
 class ToolTip:
@@ -97,6 +74,407 @@ class ToolTip:
             self.tooltip_window.destroy()
             self.tooltip_window = None
 
+# -------------------- VIRTUALIZED FILE LIST --------------------
+class VirtualFileList(ctk.CTkFrame):
+    """Scrollable, category-grouped file list that only builds visible rows.
+
+    The list is a flat sequence of items, either ("header", category, count)
+    or ("file", row) where row indexes a ScanResults store. A small pool of
+    header and file row widgets, sized to the viewport, is placed at fixed
+    offsets and re-bound to whichever items are in view on every scroll or
+    resize, so the cost of showing results depends on the viewport height
+    and not on how many files were found.
+    """
+    ROW_HEIGHT = 36
+    WHEEL_ROWS = 3
+
+    def __init__(self, master, app, **kwargs):
+        super().__init__(master, **kwargs)
+        self.app = app  # Reference to the main DiskAnalyzerGUI instance.
+        self.results = None
+        self.items = []
+        self.first = 0
+        self.collapsed = set()
+        self.sections = []
+        self.header_pool = []
+        self.file_pool = []
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure(0, weight=1)
+        title = ctk.CTkLabel(self, text="Files by Category", font=("Segoe UI", 12), text_color="#FFFFFF")
+        title.grid(row=0, column=0, columnspan=2, pady=(5, 0))
+        self.body = ctk.CTkFrame(self, fg_color=kwargs.get("fg_color", "#2A2A2A"))
+        self.body.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+        self.body.bind("<Configure>", lambda event: self.render())
+        self.bind_wheel(self.body)
+
+    def set_sections(self, results, sections):
+        """Show sections, a list of (category, rows) with rows already filtered and sorted."""
+        self.results = results
+        self.sections = sections
+        for row in self.file_pool:
+            row["index"] = None  # Rows may now point into a different store.
+        self.rebuild_items()
+
+    def rebuild_items(self):
+        items = []
+        for category, rows in self.sections:
+            items.append(("header", category, len(rows)))
+            if category not in self.collapsed:
+                items.extend(("file", row) for row in rows)
+        self.items = items
+        self.first = min(self.first, self.max_first())
+        self.render()
+
+    def toggle_section(self, category):
+        if category in self.collapsed:
+            self.collapsed.discard(category)
+        else:
+            self.collapsed.add(category)
+        self.rebuild_items()
+
+    def visible_count(self):
+        return max(1, self.body.winfo_height() // self.ROW_HEIGHT)
+
+    def max_first(self):
+        return max(0, len(self.items) - self.visible_count())
+
+    def scroll_to(self, first):
+        first = max(0, min(int(first), self.max_first()))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * len(self.items))
+        elif action == "scroll":
+            step = self.visible_count() if unit == "pages" else self.WHEEL_ROWS
+            self.scroll_to(self.first + int(value) * step)
+
+    def on_wheel(self, event):
+        if event.num == 4:
+            delta = -1
+        elif event.num == 5:
+            delta = 1
+        else:
+            delta = -1 if event.delta > 0 else 1
+        self.scroll_to(self.first + delta * self.WHEEL_ROWS)
+
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self.on_wheel)
+        widget.bind("<Button-4>", self.on_wheel)
+        widget.bind("<Button-5>", self.on_wheel)
+
+    def make_header_row(self):
+        button = ctk.CTkButton(self.body, text="", height=self.ROW_HEIGHT - 6, anchor="w",
+                               font=("Segoe UI", 12), fg_color="#444444", hover_color="#555555",
+                               text_color="#FFFFFF")
+        row = {"widget": button, "category": None,
+               "tip": ToolTip(button, "", self.app)}
+        button.configure(command=lambda r=row: self.toggle_section(r["category"]))
+        self.bind_wheel(button)
+        return row
+
+    def make_file_row(self):
+        frame = ctk.CTkFrame(self.body, height=self.ROW_HEIGHT - 4, corner_radius=5)
+        frame.pack_propagate(False)
+        row = {"widget": frame, "index": None}
+        name_label = ctk.CTkLabel(frame, text="", anchor="w", width=300,
+                                  font=("Segoe UI", 12), text_color="#FFFFFF")
+        name_label.pack(side="left", padx=5, fill="x", expand=True)
+        size_label = ctk.CTkLabel(frame, text="", anchor="e", width=100,
+                                  font=("Segoe UI", 12), text_color="#FFFFFF")
+        size_label.pack(side="left", padx=5)
+        delete_btn = ctk.CTkButton(
+            frame, text="Delete", width=65, corner_radius=5,
+            fg_color="#FF4C4C", hover_color="#FF3B3B", text_color="#FFFFFF",
+            font=("Segoe UI", 12), command=lambda: self.app.delete_file(self.row_path(row), row["index"])
+        )
+        delete_btn.pack(side="right", padx=3)
+        ToolTip(delete_btn, "Delete this file (after confirmation).", self.app)
+        open_btn = ctk.CTkButton(
+            frame, text="Open Folder", width=65, corner_radius=5,
+            fg_color="#1E90FF", hover_color="#1C90EE", text_color="#FFFFFF",
+            font=("Segoe UI", 12), command=lambda: self.app.open_in_explorer(self.row_path(row))
+        )
+        open_btn.pack(side="right", padx=3)
+        ToolTip(open_btn, "Open the folder containing this file.", self.app)
+        row.update(name=name_label, size=size_label,
+                   name_tip=ToolTip(name_label, "", self.app),
+                   size_tip=ToolTip(size_label, "", self.app))
+        for widget in (frame, name_label, size_label):
+            widget.bind("<Button-1>", lambda event: self.app.select_row(row["index"]))
+            widget.bind("<Button-3>", lambda event: self.app.show_context_menu(event, self.row_path(row), row["index"]))
+            self.bind_wheel(widget)
+        for widget in (open_btn, delete_btn):
+            self.bind_wheel(widget)
+        return row
+
+    def row_path(self, row):
+        return self.results.path(row["index"])
+
+    def render(self):
+        total = len(self.items)
+        visible = self.visible_count()
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        used_headers = 0
+        used_files = 0
+        for slot, item in enumerate(self.items[self.first:self.first + visible]):
+            y = slot * self.ROW_HEIGHT
+            if item[0] == "header":
+                if used_headers == len(self.header_pool):
+                    self.header_pool.append(self.make_header_row())
+                row = self.header_pool[used_headers]
+                used_headers += 1
+                self.bind_header(row, item[1], item[2])
+            else:
+                if used_files == len(self.file_pool):
+                    self.file_pool.append(self.make_file_row())
+                row = self.file_pool[used_files]
+                used_files += 1
+                self.bind_file(row, item[1])
+            row["widget"].place(x=5, y=y + 2, relwidth=0.98)
+        for row in self.header_pool[used_headers:]:
+            row["widget"].place_forget()
+        for row in self.file_pool[used_files:]:
+            row["widget"].place_forget()
+
+    def bind_header(self, row, category, count):
+        marker = "▶" if category in self.collapsed else "▼"
+        text = f"{marker} {category} ({count})"
+        if row.get("text") == text:
+            return
+        row["category"] = category
+        row["text"] = text
+        row["widget"].configure(text=text)
+        row["tip"].text = f"Expand or collapse the {category} section."
+
+    def bind_file(self, row, index):
+        results = self.results
+        size = results.sizes[index]
+        color = "#1E90FF" if index == self.app.selected_row else self.app.pick_size_color(size)
+        if row["index"] == index and row.get("color") == color:
+            return
+        row["index"] = index
+        row["color"] = color
+        file_name = results.names[index]
+        size_human = humanize.naturalsize(size)
+        row["widget"].configure(fg_color=color)
+        row["name"].configure(text=file_name, fg_color=color)
+        row["size"].configure(text=size_human, fg_color=color)
+        row["name_tip"].text = f"File: {file_name}"
+        row["size_tip"].text = f"Size: {size_human}"
+
+# -------------------- TREEMAP VIEW --------------------
+class TreemapView(ctk.CTkFrame):
+    """Folder treemap of a DirectoryTree, drawn on a tk.Canvas with drill-down.
+
+    Only LEVELS levels below the current folder are drawn: its entries, and
+    inside each folder tile large enough to hold them, that folder's own
+    entries. Tiles come from a TreemapLayout, which caches each folder's
+    layout by size, so drilling back up or redrawing costs no new layout
+    work, and small entries are merged into one tile per folder. Click a
+    folder to drill into it; right-click or Up goes back to the parent.
+    """
+    LEVELS = 2
+    HEADER = 16  # Label band above the nested tiles of a folder.
+    PADDING = 2
+    # (folder tile, nested tile) colors, cycled over the current folder's entries.
+    COLORS = [("#1F5F9F", "#2E7FCF"), ("#2E7D4F", "#3FA36A"), ("#8A5A1E", "#B57A2E"),
+              ("#6A3F8F", "#8C5BB8"), ("#8F2F3F", "#B8465A"), ("#2F7F7F", "#40A8A8")]
+    FILES_COLOR = "#555555"
+    MORE_COLOR = "#3A3A3A"
+
+    def __init__(self, master, app, tree, **kwargs):
+        super().__init__(master, **kwargs)
+        self.app = app  # Reference to the main DiskAnalyzerGUI instance.
+        self.tree = tree
+        self.layout = TreemapLayout(tree)
+        self.current = 0
+        self.size = None
+        self.tile_items = {}  # canvas item id -> (kind, dir_id, size)
+        self.render_after_id = None
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure(1, weight=1)
+        self.up_btn = ctk.CTkButton(self, text="Up", width=60, command=self.go_up,
+                                    fg_color="#444444", hover_color="#555555", text_color="#FFFFFF",
+                                    font=("Segoe UI", 12))
+        self.up_btn.grid(row=0, column=0, padx=(5, 10), pady=5)
+        self.path_label = ctk.CTkLabel(self, text="", anchor="w", font=("Segoe UI", 12), text_color="#FFFFFF")
+        self.path_label.grid(row=0, column=1, sticky="ew")
+        self.canvas = tk.Canvas(self, bg="#2A2A2A", highlightthickness=0)
+        self.canvas.grid(row=1, column=0, columnspan=2, sticky="nsew")
+        self.hover_label = ctk.CTkLabel(self, text="", anchor="w", font=("Segoe UI", 12), text_color="#CCCCCC")
+        self.hover_label.grid(row=2, column=0, columnspan=2, sticky="ew", padx=5)
+        self.canvas.bind("<Configure>", lambda event: self.schedule_render())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Button-3>", lambda event: self.go_up())
+        self.canvas.bind("<Motion>", self.on_motion)
+
+    def set_tree(self, tree):
+        self.tree = tree
+        self.layout = TreemapLayout(tree)
+        self.current = 0
+        self.schedule_render()
+
+    def refresh(self):
+        """Redraw after the tree's sizes changed, e.g. a file was deleted."""
+        self.layout.clear()
+        self.schedule_render()
+
+    def schedule_render(self):
+        # Coalesce the burst of <Configure> events a window resize produces.
+        if self.render_after_id is not None:
+            self.after_cancel(self.render_after_id)
+        self.render_after_id = self.after(50, self.render)
+
+    def go_up(self):
+        parent = self.tree.parents[self.current]
+        if parent >= 0:
+            self.current = parent
+            self.render()
+
+    def drill(self, dir_id):
+        if dir_id != self.current:
+            self.current = dir_id
+            self.render()
+
+    def render(self):
+        self.render_after_id = None
+        canvas = self.canvas
+        canvas.delete("all")
+        self.tile_items = {}
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if (width, height) != self.size:
+            self.size = (width, height)
+            self.layout.clear()  # Layouts for the old canvas size will not be asked for again.
+        tree = self.tree
+        self.path_label.configure(
+            text=f"{tree.path(self.current)}  ({humanize.naturalsize(tree.total_sizes[self.current])}, "
+                 f"{tree.total_files[self.current]:,} files)"
+        )
+        self.up_btn.configure(state="normal" if self.current > 0 else "disabled")
+        self.draw_level(self.current, 0, 0, width, height, 0, None)
+
+    def draw_level(self, dir_id, x0, y0, width, height, depth, colors):
+        canvas = self.canvas
+        for slot, (kind, item_id, size, x, y, w, h) in enumerate(self.layout.tiles(dir_id, int(width), int(height))):
+            if w < 1 or h < 1:
+                continue
+            x += x0
+            y += y0
+            if kind == "files":
+                fill = self.FILES_COLOR
+            elif kind == "more":
+                fill = self.MORE_COLOR
+            else:
+                if depth == 0:
+                    colors = self.COLORS[slot % len(self.COLORS)]
+                fill = colors[min(depth, 1)]
+            tile = (kind, item_id, size)
+            rect = canvas.create_rectangle(x, y, x + w, y + h, fill=fill, outline="#1A1A1A")
+            self.tile_items[rect] = tile
+            if w > 40 and h > 14:
+                label = self.tile_label(kind, item_id)
+                max_chars = int((w - 6) // 7)
+                if len(label) > max_chars:
+                    label = label[:max(1, max_chars - 1)] + "…"
+                text = canvas.create_text(x + 3, y + 2, anchor="nw", text=label, fill="#FFFFFF",
+                                          font=("Segoe UI", 9))
+                self.tile_items[text] = tile
+            if (kind == "dir" and depth + 1 < self.LEVELS
+                    and w > 4 * self.PADDING + 20 and h > self.HEADER + self.PADDING + 20):
+                self.draw_level(item_id, x + self.PADDING, y + self.HEADER, w - 2 * self.PADDING,
+                                h - self.HEADER - self.PADDING, depth + 1, colors)
+
+    def tile_label(self, kind, dir_id):
+        tree = self.tree
+        if kind == "files":
+            return f"{tree.own_files[dir_id]:,} files"
+        if kind == "more":
+            return "smaller items"
+        return tree.names[dir_id]
+
+    def tile_at(self, event):
+        items = self.canvas.find_withtag("current")
+        return self.tile_items.get(items[0]) if items else None
+
+    def on_click(self, event):
+        tile = self.tile_at(event)
+        if tile is not None and tile[0] == "dir":
+            self.drill(tile[1])
+
+    def on_motion(self, event):
+        tile = self.tile_at(event)
+        if tile is None:
+            self.hover_label.configure(text="")
+            return
+        kind, dir_id, size = tile
+        tree = self.tree
+        if kind == "dir":
+            text = f"{tree.path(dir_id)}: {humanize.naturalsize(size)} in {tree.total_files[dir_id]:,} files"
+        elif kind == "files":
+            text = f"Files directly in {tree.path(dir_id)}: {humanize.naturalsize(size)}"
+        else:
+            text = f"Smaller items in {tree.path(dir_id)}: {humanize.naturalsize(size)}"
+        self.hover_label.configure(text=text)
+
+# -------------------- STREAMED AI OUTPUT --------------------
+class ThinkSplitter:
+    """Separates a model's <think> block from its answer while the output streams in.
+
+    feed() takes chunks as they arrive. A tag can be split across chunks,
+    so a trailing "<..." that may still turn into <think> or </think> is
+    held back until the next chunk (or flush()) settles it.
+    """
+    OPEN_TAG = re.compile(r"<\s*think\s*>", re.IGNORECASE)
+    CLOSE_TAG = re.compile(r"<\s*/\s*think\s*>", re.IGNORECASE)
+    MAX_TAG_LENGTH = 16  # Longest partial tag worth holding back, spaces included.
+
+    def __init__(self):
+        self.thinking = False
+        self.pending = ""
+        self.answer_parts = []
+        self.think_parts = []
+
+    def emit(self, text):
+        if text:
+            (self.think_parts if self.thinking else self.answer_parts).append(text)
+
+    def feed(self, chunk: str):
+        text = self.pending + chunk
+        self.pending = ""
+        while text:
+            match = (self.CLOSE_TAG if self.thinking else self.OPEN_TAG).search(text)
+            if match:
+                self.emit(text[:match.start()])
+                self.thinking = not self.thinking
+                text = text[match.end():]
+                continue
+            start = text.rfind("<")
+            if start != -1 and ">" not in text[start:] and len(text) - start < self.MAX_TAG_LENGTH:
+                self.pending = text[start:]
+                text = text[:start]
+            self.emit(text)
+            break
+
+    def flush(self):
+        self.emit(self.pending)
+        self.pending = ""
+
+    @property
+    def answer(self) -> str:
+        return "".join(self.answer_parts)
+
+    @property
+    def think(self) -> str:
+        return "".join(self.think_parts)
+
 # -------------------- MAIN APPLICATION CLASS --------------------
 class DiskAnalyzerGUI:
     def __init__(self):
@@ -108,29 +486,55 @@ class DiskAnalyzerGUI:
         # Hover tooltips remain enabled.
         self.tooltips_enabled = True
         # Scan configuration.
-        self.two_pass_scan = True
+        # Single pass by default: the total is estimated while walking (see ScanEstimator)
+        # instead of walking the tree twice.
+        self.two_pass_scan = False
+        self.scan_engine = "parallel"  # Key into SCAN_ENGINES; "walk" is the old os.walk walker.
+        self.scan_workers = 8  # Threads used by the "parallel" engine.
+        self.scan_processes = os.cpu_count() or 1  # Worker processes for the "process" engine.
+        # Directory listings are cached between scans so rescans only re-list changed directories.
+        self.use_scan_cache = True
+        self.scan_cache_file = "scan_cache.db"
+        # User-defined categories ({"name": [".ext", ...]}) merged over the built-in ones.
+        self.categories_file = "categories.json"
         self.scanning = False
         self.skip_system_dirs = True
         self.min_file_size_mb = 10  # Default threshold in MB.
-        self.top_k = 0  # 0 means store all (bounded).
-        self.progress_update_interval = 50
-        # Scanning statistics and data.
-        self.total_size_scanned = 0
-        self.items_scanned = 0
-        self.total_items = 0
-        self.current_progress = 0
+        self.top_k = 0  # 0 keeps every file; N > 0 keeps only the N largest overall and per category.
+        self.keep_options = {"All files": 0, "Top 1,000": 1_000, "Top 10,000": 10_000, "Top 100,000": 100_000}
+        self.progress_poll_ms = 100  # The progress display samples the scanner at 10 Hz.
+        self.progress_after_id = None
+        # Scanning statistics and data; the scanner owns the counters of the current scan.
+        # Each scan runs in its own ScanSession so late callbacks from a cancelled one are dropped.
+        self.scanner = DiskScanner()
+        self.session = ScanSession(self.scanner)
         self.scan_start_time = None
-        self.file_heap = []    # For top-K mode.
-        self.file_list = []    # For full list.
-        self.file_map = {}     # Mapping: path -> size.
-        self.file_mtime = {}   # Mapping: path -> modification time.
-        self.size_dict = {}     # For duplicate detection by size.
-        self.category_map = {} # category -> [count, total_size].
-        # Grouped files: category -> list of (size, path).
-        self.grouped_files = {}
-        # Variables for row selection.
+        self.results = self.scanner.results  # Files above threshold: size, mtime, category, path.
+        self.duplicate_groups = []  # Content-verified duplicates: [(size, [paths])].
+        self.finding_duplicates = False
+        self.duplicate_workers = 4
+        self.hash_cache_file = "hash_cache.db"
+        self.category_map = self.scanner.categories  # category -> [count, total_size].
+        self.dir_tree = None  # DirectoryTree of the last complete scan: size per folder, all files.
+        self.scan_summary = None  # ScanSummary of the last complete scan: totals, top files and folders.
+        self.treemap_window = None
+        self.treemap_view = None
+        # Category charts: one reused off-screen figure, rendered on a worker thread after each scan.
+        self.charts = None
+        self.chart_image = None  # ((width, height), png, data) of the last render.
+        self.chart_size = (1000, 640)
+        self.chart_render_id = 0
+        self.chart_lock = threading.Lock()  # Serializes figure work; the figure is built by the first render.
+        self.chart_window = None
+        self.chart_label = None
+        self.chart_photo = None
+        self.chart_resize_after_id = None
+        # Selected row (an index into self.results).
         self.selected_row = None
-        self.row_original_colors = {}
+        # Filter/sort engine for the current results, and the pending debounced refresh.
+        self.result_filter = None
+        self.filter_after_id = None
+        self.filter_debounce_ms = 150
         # Analysis history.
         self.analysis_history = []
         # Chat history.
@@ -142,20 +546,40 @@ class DiskAnalyzerGUI:
         # Hold references to the Help and Tour windows.
         self.help_window = None
         self.tour_window = None
-        # AI provider configuration.
-        # Default provider is Gemini; user can switch to DeepSeekR1.
+        # AI provider configuration: dropdown name -> settings for deepscan.llm.create_provider().
+        # Entries in ai_providers.json are merged over these, e.g. to point at a faster inference box.
+        self.ai_providers_file = "ai_providers.json"
+        self.ai_providers = {
+            "Gemini": {"provider": "gemini", "model": "gemini-1.5-pro"},
+            # DeepSeekR1 7B fits a consumer GPU such as an RTX 3060Ti; Ollama's default port is 11434.
+            "DeepSeekR1": {"provider": "ollama", "model": "deepseek-r1", "base_url": "http://localhost:11434",
+                           "read_timeout": 120},
+            "Local (OpenAI API)": {"provider": "openai", "model": "local-model",
+                                   "base_url": "http://localhost:8000/v1"},
+        }
         self.default_ai_provider = "Gemini"
-        self.model = None  # Will be initialized on demand for Gemini.
+        self.ai_clients = {}  # Provider instances by name, created on first use and reused.
+        self.gemini_api_key = None
         self.ai_enabled = True
-        # Define the Ollama server port.
-        # For DeepSeekR1 7B (on a consumer GPU such as an RTX 3060Ti), use the default port 11434.
-        self.ollama_port = 11434
+        # Answers are cached by provider, server, model and prompt; scan prompts embed the scan's totals,
+        # so asking again about unchanged data is answered instantly without a request.
+        self.use_ai_cache = True
+        self.ai_cache_file = "ai_cache.db"
+        self.ai_cache_ttl = 7 * 24 * 3600  # Seconds.
+        self.ai_cache_max_entries = 500
+        self.ai_cache = None
+        # Minimum time between redraws of a streaming answer.
+        self.stream_update_ms = 50
 
         self.setup_logging()
         self.initialize_ai()  # Initializes Gemini if needed.
         self.setup_gui()
         self.load_layout_preferences()
         self.bind_shortcuts()
+        self.window.after_idle(self.log_startup_time)
+
+    def log_startup_time(self):
+        self.logger.info(f"Window ready {time.perf_counter() - STARTUP_START:.2f}s after start")
 
     # -------------------- HELPER: SAFE AFTER --------------------
     def safe_after(self, delay, callback, *args, **kwargs):
@@ -181,7 +605,19 @@ class DiskAnalyzerGUI:
             self.status_label.configure(text=f"Error: {message}")
 
     def initialize_ai(self):
-        if self.default_ai_provider == "Gemini":
+        try:
+            self.ai_providers = load_provider_settings(self.ai_providers_file, self.ai_providers)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Ignoring {self.ai_providers_file}: {e}")
+        if self.default_ai_provider not in self.ai_providers:
+            self.default_ai_provider = next(iter(self.ai_providers))
+        if self.use_ai_cache:
+            try:
+                self.ai_cache = ResponseCache(self.ai_cache_file, self.ai_cache_ttl, self.ai_cache_max_entries)
+            except Exception as e:
+                self.logger.error(f"AI response cache disabled: {e}")
+        # Only look for the key here; the Gemini client is set up by the first request.
+        if self.ai_providers[self.default_ai_provider]["provider"] == "gemini":
             try:
                 load_dotenv()
                 api_key = os.getenv("GEMINI_API_KEY")
@@ -190,14 +626,12 @@ class DiskAnalyzerGUI:
                     api_key = self.show_api_key_dialog()
                     if not api_key:  # User canceled
                         raise ValueError("Gemini API key not provided")
-                genai.configure(api_key=api_key)
-                self.model = genai.GenerativeModel("gemini-1.5-pro")
+                self.gemini_api_key = api_key
                 self.ai_enabled = True
-                self.logger.info("Gemini AI initialization successful")
+                self.logger.info("Gemini API key found")
             except Exception as e:
                 self.logger.error(f"Gemini AI initialization failed: {e}")
                 self.ai_enabled = False
-                self.model = None
                 # Show API key dialog on failure
                 if "API_KEY_INVALID" in str(e) or "API key not found" in str(e):
                     self.safe_after(0, self.show_api_key_dialog)
@@ -356,7 +790,7 @@ class DiskAnalyzerGUI:
         self.top_frame.grid(row=0, column=0, sticky="ew", padx=20, pady=15)
 
         # Ensure we have enough columns for all buttons and they're properly weighted
-        for col in range(16):  # Increased from 14 to 16 to ensure enough space
+        for col in range(17):  # One column per top-bar control.
             if col == 0:  # Give more weight to the first column (status label)
                 self.top_frame.columnconfigure(col, weight=1)
             else:
@@ -391,24 +825,32 @@ class DiskAnalyzerGUI:
             font=("Segoe UI", 12), text_color="#FFFFFF"
         )
         self.skip_sys_check.grid(row=0, column=3, padx=(0, 15), pady=5, sticky="w")
-        ToolTip(self.skip_sys_check, "Toggle to skip Windows system directories.", self)
+        ToolTip(self.skip_sys_check, "Toggle to skip system directories (e.g. Windows, Program Files, /proc, /sys).", self)
+
+        self.keep_var = ctk.StringVar(value="All files")
+        self.keep_menu = ctk.CTkOptionMenu(
+            self.top_frame, variable=self.keep_var, values=list(self.keep_options), width=120,
+            font=("Segoe UI", 12)
+        )
+        self.keep_menu.grid(row=0, column=4, padx=(0, 15), pady=5, sticky="w")
+        ToolTip(self.keep_menu, "Keep every file, or only the largest N overall and per type (less memory).", self)
 
         self.status_label = ctk.CTkLabel(
             self.top_frame, text="Ready to scan", font=("Segoe UI", 12),
             text_color="#FFFFFF"
         )
-        self.status_label.grid(row=0, column=4, padx=5, pady=5, sticky="w")
+        self.status_label.grid(row=0, column=5, padx=5, pady=5, sticky="w")
 
         self.progress_label = ctk.CTkLabel(
             self.top_frame, text="0%  (0/0)", font=("Segoe UI", 12), width=140,
             text_color="#FFFFFF"
         )
-        self.progress_label.grid(row=0, column=5, padx=(10, 0), pady=5, sticky="e")
+        self.progress_label.grid(row=0, column=6, padx=(10, 0), pady=5, sticky="e")
 
         self.progress_bar = ctk.CTkProgressBar(
             self.top_frame, mode="determinate", height=15, corner_radius=5, border_width=0, width=160
         )
-        self.progress_bar.grid(row=0, column=6, padx=(10, 0), pady=5, sticky="e")
+        self.progress_bar.grid(row=0, column=7, padx=(10, 0), pady=5, sticky="e")
         self.progress_bar.set(0)
 
         self.export_btn = ctk.CTkButton(
@@ -416,32 +858,48 @@ class DiskAnalyzerGUI:
             fg_color="#32CD32", hover_color="#2EB82E", text_color="#FFFFFF",
             font=("Segoe UI", 12)
         )
-        self.export_btn.grid(row=0, column=7, padx=(10, 0), pady=5, sticky="e")
+        self.export_btn.grid(row=0, column=8, padx=(10, 0), pady=5, sticky="e")
         ToolTip(self.export_btn, "Export the current analysis report to a file.", self)
 
-        self.ai_provider = ctk.StringVar(value="Gemini")
+        self.ai_provider = ctk.StringVar(value=self.default_ai_provider)
         self.ai_provider_dropdown = ctk.CTkOptionMenu(
             self.top_frame, variable=self.ai_provider,
-            values=["Gemini", "DeepSeekR1"],
+            values=list(self.ai_providers),
             font=("Segoe UI", 12)
         )
-        self.ai_provider_dropdown.grid(row=0, column=8, padx=(10, 0), pady=5, sticky="e")
-        ToolTip(self.ai_provider_dropdown, "Select AI Provider (Gemini or DeepSeekR1)", self)
+        self.ai_provider_dropdown.grid(row=0, column=9, padx=(10, 0), pady=5, sticky="e")
+        ToolTip(self.ai_provider_dropdown, f"Select AI Provider (more can be added in {self.ai_providers_file})", self)
 
         self.chart_btn = ctk.CTkButton(
             self.top_frame, text="Show Chart", command=self.show_chart_window, width=140,
             fg_color="#6A5ACD", hover_color="#836FFF", text_color="#FFFFFF",
             font=("Segoe UI", 12)
         )
-        self.chart_btn.grid(row=0, column=9, padx=(10, 0), pady=5, sticky="e")
+        self.chart_btn.grid(row=0, column=10, padx=(10, 0), pady=5, sticky="e")
         ToolTip(self.chart_btn, "Display visual charts summarizing disk usage.", self)
 
+        self.treemap_btn = ctk.CTkButton(
+            self.top_frame, text="Treemap", command=self.show_treemap_window, width=100,
+            fg_color="#2E8B57", hover_color="#3CB371", text_color="#FFFFFF",
+            font=("Segoe UI", 12)
+        )
+        self.treemap_btn.grid(row=0, column=11, padx=(10, 0), pady=5, sticky="e")
+        ToolTip(self.treemap_btn, "Show which folders take the most space; click a folder to drill in.", self)
+
+        self.dupes_btn = ctk.CTkButton(
+            self.top_frame, text="Find Duplicates", command=self.find_duplicates, width=140,
+            fg_color="#CD5C5C", hover_color="#B22222", text_color="#FFFFFF",
+            font=("Segoe UI", 12)
+        )
+        self.dupes_btn.grid(row=0, column=12, padx=(10, 0), pady=5, sticky="e")
+        ToolTip(self.dupes_btn, "Find files with identical content among the scanned files.", self)
+
         self.collapse_left_btn = ctk.CTkButton(
             self.top_frame, text="Toggle File List", command=self.toggle_left_panel, width=140,
             fg_color="#FFA500", hover_color="#FF8C00", text_color="#FFFFFF",
             font=("Segoe UI", 12)
         )
-        self.collapse_left_btn.grid(row=0, column=10, padx=(10, 0), pady=5, sticky="e")
+        self.collapse_left_btn.grid(row=0, column=13, padx=(10, 0), pady=5, sticky="e")
         ToolTip(self.collapse_left_btn, "Show or hide the file list panel.", self)
 
         self.tour_btn = ctk.CTkButton(
@@ -449,7 +907,7 @@ class DiskAnalyzerGUI:
             fg_color="#20B2AA", hover_color="#1E8C90", text_color="#FFFFFF",
             font=("Segoe UI", 12)
         )
-        self.tour_btn.grid(row=0, column=11, padx=(10, 0), pady=5, sticky="e")
+        self.tour_btn.grid(row=0, column=14, padx=(10, 0), pady=5, sticky="e")
         ToolTip(self.tour_btn, "Start a guided tour of the app.", self)
 
         self.help_btn = ctk.CTkButton(
@@ -457,7 +915,7 @@ class DiskAnalyzerGUI:
             fg_color="#8A2BE2", hover_color="#7A1AB2", text_color="#FFFFFF",
             font=("Segoe UI", 12)
         )
-        self.help_btn.grid(row=0, column=12, padx=(10, 0), pady=5, sticky="e")
+        self.help_btn.grid(row=0, column=15, padx=(10, 0), pady=5, sticky="e")
         ToolTip(self.help_btn, "View detailed instructions on how to use the app.", self)
 
         self.exit_btn = ctk.CTkButton(
@@ -465,7 +923,7 @@ class DiskAnalyzerGUI:
             fg_color="#FF4C4C", hover_color="#FF3B3B", text_color="#FFFFFF",
             font=("Segoe UI", 12)
         )
-        self.exit_btn.grid(row=0, column=13, padx=(10, 0), pady=5, sticky="e")
+        self.exit_btn.grid(row=0, column=16, padx=(10, 0), pady=5, sticky="e")
         ToolTip(self.exit_btn, "Exit the application.", self)
 
         self.middle_frame = ctk.CTkFrame(self.window)
@@ -490,7 +948,7 @@ class DiskAnalyzerGUI:
         self.filter_entry = ctk.CTkEntry(controls_frame, textvariable=self.filter_var, width=150, font=("Segoe UI", 12))
         self.filter_entry.grid(row=0, column=1, padx=(0, 10))
         ToolTip(self.filter_entry, "Type text here to filter files.", self)
-        self.filter_entry.bind("<KeyRelease>", lambda event: self.update_results())
+        self.filter_entry.bind("<KeyRelease>", lambda event: self.schedule_results_update())
 
         sort_label = ctk.CTkLabel(controls_frame, text="Sort by:", font=("Segoe UI", 12), text_color="#FFFFFF")
         sort_label.grid(row=0, column=2, padx=(10, 5))
@@ -498,6 +956,7 @@ class DiskAnalyzerGUI:
         self.sort_options = ctk.StringVar(value="Size Desc")
         self.sort_menu = ctk.CTkOptionMenu(controls_frame, variable=self.sort_options,
                                            values=["Name Asc", "Name Desc", "Size Asc", "Size Desc"],
+                                           command=lambda choice: self.update_results(),
                                            font=("Segoe UI", 12))
         self.sort_menu.grid(row=0, column=3, padx=(0, 10))
         ToolTip(self.sort_menu, "Choose how to sort the files.", self)
@@ -506,8 +965,8 @@ class DiskAnalyzerGUI:
         sort_btn.grid(row=0, column=4)
         ToolTip(sort_btn, "Apply the filter and sort options.", self)
 
-        self.file_scroll_frame = ctk.CTkScrollableFrame(self.left_frame, label_text="Files by Category", fg_color="#2A2A2A")
-        self.file_scroll_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+        self.file_list_view = VirtualFileList(self.left_frame, self, fg_color="#2A2A2A")
+        self.file_list_view.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
 
         # -------------------- RIGHT FRAME: AI ANALYSIS & CHATBOT --------------------
         self.right_frame = ctk.CTkFrame(self.middle_frame, fg_color="#2A2A2A", corner_radius=10)
@@ -577,11 +1036,23 @@ class DiskAnalyzerGUI:
             "  - Enter the minimum file size (in MB) to include in the scan.\n"
             "  - Files smaller than this will be ignored.\n\n"
             "Skip System Dirs:\n"
-            "  - Toggle to skip Windows system directories (helps avoid errors and speeds scanning).\n\n"
+            "  - Toggle to skip system directories such as Windows and Program Files, or /proc, /sys and /dev\n"
+            "    on Linux (helps avoid errors and speeds scanning).\n"
+            "  - Add .gitignore-style patterns to a .deepscanignore file in the scanned folder to skip more.\n\n"
+            "Keep (All files / Top N):\n"
+            "  - 'All files' lists every file above the minimum size.\n"
+            "  - 'Top N' keeps only the N largest files overall and per file type, so memory no longer grows\n"
+            "    with the file count (the listing cache is skipped; the treemap still grows with the folder\n"
+            "    count); totals and chart counts still cover every file.\n\n"
             "Export Analysis:\n"
             "  - Save the current disk analysis report to a text file.\n\n"
             "Show Chart:\n"
             "  - View charts that display file type breakdowns and disk usage.\n\n"
+            "Treemap:\n"
+            "  - See every scanned folder as a box sized by its total size, small files included.\n"
+            "  - Click a folder to drill into it; right-click or 'Up' goes back.\n\n"
+            "Find Duplicates:\n"
+            "  - Compare the scanned files by size, then by content hash, and list identical copies.\n\n"
             "Toggle File List:\n"
             "  - Show or hide the list of files found during the scan.\n\n"
             "Tour:\n"
@@ -619,8 +1090,11 @@ class DiskAnalyzerGUI:
             (self.scan_btn, "Click here to select a folder for scanning. (Shortcut: Ctrl+O)", "bottom"),
             (self.min_size_entry, "Enter the minimum file size (in MB). Files smaller than this are ignored.", "bottom"),
             (self.skip_sys_check, "Toggle to skip scanning system directories.", "bottom"),
+            (self.keep_menu, "Keep every file, or only the largest ones to save memory on huge volumes.", "bottom"),
             (self.export_btn, "Click to export the analysis report to a text file.", "bottom"),
             (self.chart_btn, "View charts that display file type breakdowns and disk usage.", "bottom"),
+            (self.treemap_btn, "See which folders take the most space, and click to drill into them.", "bottom"),
+            (self.dupes_btn, "Find files with identical content among the scanned files.", "bottom"),
             (self.collapse_left_btn, "Toggle the file list panel visibility.", "bottom"),
             (self.analyze_btn, "Run AI analysis on your scanned files to get insights and recommendations.", "bottom"),
             (chatbot_btn, "Switch to the Chatbot tab to interact with the disk management assistant.", "bottom"),
@@ -800,6 +1274,7 @@ class DiskAnalyzerGUI:
             self.min_file_size = 10 * 1024 * 1024
 
         self.skip_system_dirs = bool(self.skip_sys_var.get())
+        self.top_k = self.keep_options.get(self.keep_var.get(), 0)
 
         if self.scanning:
             if messagebox.askyesno("Confirm Cancel", "Cancel the current scan?"):
@@ -812,137 +1287,142 @@ class DiskAnalyzerGUI:
         self.scan_btn.configure(text="Stop Scan")
         self.status_label.configure(text="Scanning...")
 
+        session = self.session
         if self.two_pass_scan:
-            threading.Thread(target=self.count_files_pass, args=(path,), daemon=True).start()
+            threading.Thread(target=self.count_files_pass, args=(session, path), daemon=True).start()
         else:
-            threading.Thread(target=self.scan_directory, args=(path,), daemon=True).start()
+            threading.Thread(target=self.scan_directory, args=(session, path), daemon=True).start()
+        self.poll_progress()
 
     def stop_scan(self):
+        self.session.cancel()
         self.scanning = False
+        # Drop the partial results now; the cancelled scanner frees its own copy when its walk returns.
+        self.results = ScanResults()
+        self.category_map = {}
+        self.dir_tree = None
+        self.scan_summary = None
+        self.result_filter = None
+        self.selected_row = None
+        self.file_list_view.set_sections(self.results, [])
         self.scan_btn.configure(text="Select Folder (Ctrl+O)")
         self.status_label.configure(text="Scan stopped")
 
+    def is_current_session(self, session) -> bool:
+        return session.generation == self.session.generation and not session.cancelled
+
     def reset_scan_stats(self):
-        self.total_size_scanned = 0
-        self.items_scanned = 0
-        self.total_items = 0
-        self.current_progress = 0
-        self.file_heap.clear()
-        self.file_list.clear()
-        self.file_map.clear()
-        self.file_mtime.clear()
-        self.size_dict.clear()
-        self.category_map = {}
-        self.grouped_files = {}
+        self.session.cancel()
+        self.scanner = DiskScanner(
+            min_file_size=self.min_file_size,
+            skip_system_dirs=self.skip_system_dirs,
+            engine=self.scan_engine,
+            workers=self.scan_workers,
+            processes=self.scan_processes,
+            top_k=self.top_k,
+            cache=ScanCache(self.scan_cache_file) if self.use_scan_cache else None,
+            category_index=self.load_category_index(),
+        )
+        self.session = ScanSession(self.scanner)
+        self.results = self.scanner.results
+        self.category_map = self.scanner.categories
+        self.dir_tree = None
+        self.scan_summary = None
+        self.duplicate_groups = []
         self.progress_bar.set(0)
         self.progress_label.configure(text="0%  (0/0)")
         self.selected_row = None
-        self.row_original_colors = {}
+        self.file_list_view.set_sections(self.results, [])
 
-    def count_files_pass(self, path: Path):
+    def load_category_index(self):
+        # Read on every scan so edits to the categories file apply without a restart.
+        try:
+            return CategoryIndex(load_categories(self.categories_file))
+        except (OSError, ValueError) as e:
+            self.log_error(f"Ignoring custom categories: {e}")
+            return CategoryIndex()
+
+    # Worker threads only touch their own session's scanner; anything aimed at the
+    # GUI goes through safe_after and is dropped there if the session is stale.
+    def count_files_pass(self, session, path: Path):
         try:
             if not path.exists():
-                self.log_error(f"Path does not exist: {path}")
+                self.safe_after(0, self.log_error, f"Path does not exist: {path}")
+                self.safe_after(0, self.scan_complete, session)
                 return
-            count = 0
-            for root, dirs, files in os.walk(path):
-                if not self.scanning:
-                    break
-                if self.skip_system_dirs and self.should_skip_dir(root):
-                    dirs[:] = []
-                    continue
-                count += len(files)
-                if count % 1000 == 0:
-                    self.safe_after(0, lambda c=count: self.status_label.configure(text=f"Counting files: {c:,}..."))
-            self.total_items = count
-            self.safe_after(0, self.start_actual_scan, path)
+            session.scanner.count_files(path)
+            self.safe_after(0, self.start_actual_scan, session, path)
         except Exception as e:
             self.logger.error(f"Counting files failed: {e}")
-            self.scanning = False
-            self.safe_after(0, self.scan_complete)
+            self.safe_after(0, self.scan_complete, session)
 
-    def start_actual_scan(self, path: Path):
-        if not self.scanning:
+    def start_actual_scan(self, session, path: Path):
+        if not self.is_current_session(session):
             return
-        threading.Thread(target=self.scan_directory, args=(path,), daemon=True).start()
+        threading.Thread(target=self.scan_directory, args=(session, path), daemon=True).start()
 
-    def scan_directory(self, path: Path):
+    def scan_directory(self, session, path: Path):
         try:
             if not path.exists():
-                self.log_error(f"Path does not exist: {path}")
+                self.safe_after(0, self.log_error, f"Path does not exist: {path}")
                 return
-            for root, dirs, files in os.walk(path):
-                if not self.scanning:
-                    break
-                if self.skip_system_dirs and self.should_skip_dir(root):
-                    dirs[:] = []
-                    continue
-                for filename in files:
-                    if not self.scanning:
-                        break
-                    file_path = Path(root) / filename
-                    try:
-                        st = file_path.stat()
-                        size = st.st_size
-                        mtime = st.st_mtime
-                    except (PermissionError, OSError):
-                        continue
-                    if size >= self.min_file_size:
-                        self.total_size_scanned += size
-                        self.items_scanned += 1
-                        p_str = str(file_path)
-                        self.file_map[p_str] = size
-                        self.file_mtime[p_str] = mtime
-                        ext = file_path.suffix.lower()
-                        cat = self.detect_category(ext)
-                        if cat not in self.category_map:
-                            self.category_map[cat] = [0, 0]
-                        self.category_map[cat][0] += 1
-                        self.category_map[cat][1] += size
-                        if cat not in self.grouped_files:
-                            self.grouped_files[cat] = []
-                        self.grouped_files[cat].append((size, p_str))
-                        if self.top_k > 0:
-                            if len(self.file_heap) < self.top_k:
-                                heapq.heappush(self.file_heap, (size, p_str))
-                            else:
-                                smallest_size, _ = self.file_heap[0]
-                                if size > smallest_size:
-                                    heapq.heapreplace(self.file_heap, (size, p_str))
-                        else:
-                            if len(self.file_list) < MAX_RESULTS_LIMIT:
-                                self.file_list.append((size, p_str))
-                    self.current_progress += 1
-                    if self.current_progress % self.progress_update_interval == 0:
-                        self.safe_after(0, self.update_progress)
+            session.scanner.scan(path)
         except Exception as e:
             self.logger.error(f"Scan failed: {e}")
         finally:
-            self.scanning = False
-            self.safe_after(0, self.scan_complete)
-
-    def should_skip_dir(self, root: str) -> bool:
-        lower_path = root.lower()
-        return any(sysdir in lower_path for sysdir in SYSTEM_DIRS)
-
-    def detect_category(self, ext: str) -> str:
-        for cat, exts in EXTENSION_CATEGORIES.items():
-            if ext in exts:
-                return cat
-        return "Others"
+            self.safe_after(0, self.scan_complete, session)
 
     # -------------------- PROGRESS & COMPLETION --------------------
-    def update_progress(self):
+    def poll_progress(self):
+        # The scan thread only updates counters; sample them on a fixed timer instead of
+        # having the scanner post a callback every few files.
+        if self.progress_after_id is not None:
+            self.window.after_cancel(self.progress_after_id)
+            self.progress_after_id = None
+        snapshot = self.scanner.snapshot()
+        if snapshot["phase"] == "counting":
+            self.status_label.configure(text=f"Counting files: {snapshot['counted']:,}...")
+        elif snapshot["phase"] == "scanning":
+            self.update_progress(snapshot)
+        if self.scanning:
+            self.progress_after_id = self.safe_after(self.progress_poll_ms, self.poll_progress)
+
+    def update_progress(self, snapshot: dict):
+        done = snapshot["files_seen"]
         elapsed = time.time() - self.scan_start_time if self.scan_start_time else 0.1
-        speed = self.current_progress / elapsed if elapsed > 0 else 0
-        remaining = (self.total_items - self.current_progress) / speed if speed > 0 else 0
-        progress = min(self.current_progress / self.total_items, 1.0) if self.total_items > 0 else (0.0 if self.current_progress == 0 else 0.5)
+        speed = done / elapsed if elapsed > 0 else 0
+        # An exact total comes from the counting pass; otherwise refine the estimate as we go.
+        estimated = snapshot["estimated"]
+        total = snapshot["total"]
+        remaining = max(total - done, 0) / speed if speed > 0 else 0
+        progress = min(done / total, 1.0) if total > 0 else (0.0 if done == 0 else 0.5)
+        if estimated:
+            progress = min(progress, 0.99)  # Never claim completion from an estimate.
         self.progress_bar.set(progress)
         pct = int(progress * 100)
-        self.progress_label.configure(text=f"{pct}%  ({self.current_progress:,}/{self.total_items:,})\nSpeed: {speed:.2f} files/sec, ETA: {int(remaining)} sec")
+        total_text = f"~{total:,}" if estimated else f"{total:,}"
+        self.progress_label.configure(text=f"{pct}%  ({done:,}/{total_text})\nSpeed: {speed:.2f} files/sec, ETA: {int(remaining)} sec")
         self.progress_bar.configure(progress_color="#1E90FF", border_color="#1E90FF")
 
-    def scan_complete(self):
+    def scan_complete(self, session):
+        if not self.is_current_session(session):
+            return  # Cancelled or superseded by a newer scan.
+        self.scanning = False
+        scanner = session.scanner
+        # A bounded scan builds its result store from the top-K heaps when the walk ends.
+        self.results = scanner.results
+        self.category_map = scanner.categories
+        self.dir_tree = scanner.tree
+        self.scan_summary = scanner.summary
+        if self.dir_tree is not None and self.treemap_window is not None and self.treemap_window.winfo_exists():
+            self.treemap_view.set_tree(self.dir_tree)
+        self.logger.info(
+            f"Scan walked {scanner.files_seen:,} files in {scanner.walk_elapsed:.2f}s "
+            f"({scanner.files_per_second():,.0f} files/sec, engine={scanner.engine})"
+        )
+        self.poll_progress()  # Last sample; the timer stops once scanning is off.
+        if scanner.completed:
+            self.progress_bar.set(1.0)
         def animate_completion(step=0):
             if not self.window.winfo_exists():
                 return
@@ -954,88 +1434,33 @@ class DiskAnalyzerGUI:
                 if self.window.winfo_exists():
                     self.progress_bar.configure(progress_color="#1E90FF", border_color="#1E90FF")
                     self.progress_label.configure(
-                        text=f"Scan Complete! ({self.items_scanned:,} files, {humanize.naturalsize(self.total_size_scanned)})"
+                        text=f"Scan Complete! ({scanner.matched:,} files, {humanize.naturalsize(scanner.total_size)})\n"
+                             f"{scanner.files_per_second():,.0f} files/sec ({scanner.engine})"
                     )
                     self.scan_btn.configure(text="Select Folder (Ctrl+O)")
                     self.update_results()
         animate_completion()
+        self.render_charts()
 
     # -------------------- RESULTS DISPLAY --------------------
+    def schedule_results_update(self):
+        # Debounce typing: refresh once the user pauses instead of on every key.
+        if self.filter_after_id is not None:
+            self.window.after_cancel(self.filter_after_id)
+        self.filter_after_id = self.safe_after(self.filter_debounce_ms, self.update_results)
+
     def update_results(self):
-        for widget in self.file_scroll_frame.winfo_children():
-            widget.destroy()
-        filter_text = self.filter_var.get().lower()
-        for category, files in self.grouped_files.items():
-            filtered_files = [(sz, path) for sz, path in files if filter_text in os.path.basename(path).lower()]
-            if not filtered_files:
-                continue
-            sort_order = self.sort_options.get()
-            if "Name" in sort_order:
-                filtered_files.sort(key=lambda x: os.path.basename(x[1]).lower(), reverse=("Desc" in sort_order))
-            else:
-                filtered_files.sort(key=lambda x: x[0], reverse=("Desc" in sort_order))
-            section_frame = ctk.CTkFrame(self.file_scroll_frame, fg_color="#333333", corner_radius=5)
-            section_frame.pack(fill="x", padx=10, pady=5)
-            header_frame = ctk.CTkFrame(section_frame, fg_color="#444444")
-            header_frame.pack(fill="x")
-            is_expanded = ctk.BooleanVar(value=True)
-            def toggle_section(frame=section_frame, var=is_expanded):
-                if var.get():
-                    for child in frame.winfo_children()[1:]:
-                        child.pack_forget()
-                    var.set(False)
-                else:
-                    for child in frame.winfo_children()[1:]:
-                        child.pack(fill="x", padx=5, pady=2)
-                    var.set(True)
-            toggle_btn = ctk.CTkButton(header_frame, text=f"{category} ({len(filtered_files)})", command=toggle_section,
-                                       font=("Segoe UI", 12), fg_color="#444444", hover_color="#555555", text_color="#FFFFFF")
-            toggle_btn.pack(side="left", padx=5, pady=5)
-            ToolTip(toggle_btn, f"Expand or collapse the {category} section.", self)
-            for (size, path_str) in filtered_files:
-                row_color = self.pick_size_color(size)
-                row_frame = ctk.CTkFrame(section_frame, fg_color=row_color, corner_radius=5)
-                row_frame.pack(fill="x", padx=10, pady=(0, 4))
-                self.row_original_colors[row_frame] = row_color
-                row_frame.bind("<Button-1>", lambda event, frame=row_frame: self.select_row(frame))
-                row_frame.bind("<Button-3>", lambda event, p=path_str: self.show_context_menu(event, p))
-                file_name = os.path.basename(path_str)
-                size_human = humanize.naturalsize(size)
-                file_label = ctk.CTkLabel(row_frame, text=file_name, anchor="w", width=300,
-                                           fg_color=row_color, font=("Segoe UI", 12), text_color="#FFFFFF")
-                file_label.pack(side="left", padx=5, fill="x", expand=True)
-                file_label.bind("<Button-1>", lambda event, frame=row_frame: self.select_row(frame))
-                file_label.bind("<Button-3>", lambda event, p=path_str: self.show_context_menu(event, p))
-                ToolTip(file_label, f"File: {file_name}", self)
-                size_label = ctk.CTkLabel(row_frame, text=size_human, anchor="e", width=100,
-                                           fg_color=row_color, font=("Segoe UI", 12), text_color="#FFFFFF")
-                size_label.pack(side="left", padx=5)
-                size_label.bind("<Button-1>", lambda event, frame=row_frame: self.select_row(frame))
-                size_label.bind("<Button-3>", lambda event, p=path_str: self.show_context_menu(event, p))
-                ToolTip(size_label, f"Size: {size_human}", self)
-                actions_frame = ctk.CTkFrame(row_frame, fg_color=row_color, width=160)
-                actions_frame.pack(side="left", padx=5)
-                actions_frame.bind("<Button-3>", lambda event, p=path_str: self.show_context_menu(event, p))
-                open_btn = ctk.CTkButton(
-                    actions_frame, text="Open Folder", width=65, corner_radius=5,
-                    fg_color="#1E90FF", hover_color="#1C90EE", text_color="#FFFFFF",
-                    font=("Segoe UI", 12), command=lambda p=path_str: self.open_in_explorer(p)
-                )
-                open_btn.pack(side="left", padx=3)
-                ToolTip(open_btn, "Open the folder containing this file.", self)
-                delete_btn = ctk.CTkButton(
-                    actions_frame, text="Delete", width=65, corner_radius=5,
-                    fg_color="#FF4C4C", hover_color="#FF3B3B", text_color="#FFFFFF",
-                    font=("Segoe UI", 12), command=lambda p=path_str: self.delete_file(p)
-                )
-                delete_btn.pack(side="left", padx=3)
-                ToolTip(delete_btn, "Delete this file (after confirmation).", self)
+        self.filter_after_id = None
+        if self.result_filter is None or self.result_filter.results is not self.results:
+            self.result_filter = ResultFilter(self.results)
+        sections = self.result_filter.query(self.filter_var.get(), self.sort_options.get())
+        self.file_list_view.set_sections(self.results, sections)
         self.status_label.configure(text=f"Listed files above threshold.")
 
-    def show_context_menu(self, event, file_path):
+    def show_context_menu(self, event, file_path, index=None):
         menu = Menu(self.window, tearoff=0)
         menu.add_command(label="Open Folder", command=lambda: self.open_in_explorer(file_path))
-        menu.add_command(label="Delete", command=lambda: self.delete_file(file_path))
+        menu.add_command(label="Delete", command=lambda: self.delete_file(file_path, index))
         try:
             menu.tk_popup(event.x_root, event.y_root)
         finally:
@@ -1052,12 +1477,9 @@ class DiskAnalyzerGUI:
         else:
             return "#242424"
 
-    def select_row(self, selected_frame):
-        if self.selected_row and self.selected_row != selected_frame:
-            original_color = self.row_original_colors.get(self.selected_row, "#242424")
-            self.selected_row.configure(fg_color=original_color)
-        selected_frame.configure(fg_color="#1E90FF")
-        self.selected_row = selected_frame
+    def select_row(self, index):
+        self.selected_row = index
+        self.file_list_view.render()
 
     # -------------------- FILE ACTIONS --------------------
     def open_in_explorer(self, file_path: str):
@@ -1069,107 +1491,169 @@ class DiskAnalyzerGUI:
         except Exception as e:
             self.log_error(f"Error opening folder for file: {file_path}\n{e}")
 
-    def delete_file(self, file_path: str):
+    def delete_file(self, file_path: str, index=None):
+        """Delete a file; index is its row in self.results, looked up by path when not given."""
         if messagebox.askyesno("Confirm Deletion", f"Delete file?\n{file_path}"):
             try:
+                if index is None:
+                    index = self.results.find(file_path)
+                size = None
                 # Check if file exists before attempting to delete
                 if not os.path.exists(file_path):
                     self.status_label.configure(text=f"File not found: {file_path}")
                     messagebox.showinfo("File Not Found", f"The file no longer exists:\n{file_path}")
                 else:
+                    size = os.path.getsize(file_path)
                     os.remove(file_path)
                     self.status_label.configure(text=f"Deleted: {file_path}")
 
                 # Update data structures regardless of whether file exists
-                if file_path in self.file_map:
-                    del self.file_map[file_path]
-                self.file_list = [(sz, p) for (sz, p) in self.file_list if p != file_path]
-                for cat in self.grouped_files:
-                    self.grouped_files[cat] = [(sz, p) for (sz, p) in self.grouped_files[cat] if p != file_path]
+                summary = self.scan_summary
+                if summary is not None and summary.results is self.results:
+                    summary.remove_file(file_path, index, size)
+                    if self.treemap_window is not None and self.treemap_window.winfo_exists():
+                        self.treemap_view.refresh()
+                    self.render_charts()
+                elif index is not None:
+                    self.results.remove(index)
             except Exception as e:
                 self.log_error(f"Error deleting file: {file_path}\n{e}")
                 messagebox.showerror("Error", f"Could not delete file:\n{file_path}\n\nError: {e}")
             finally:
                 self.update_results()
 
-    # -------------------- ANALYSIS THINKING HELPERS --------------------
-    def animate_thinking(self, label):
-        texts = ["Thinking", "Thinking.", "Thinking..", "Thinking..."]
-        def update(index=0):
-            if label.winfo_exists():
-                label.configure(text=texts[index % len(texts)])
-                self.safe_after(500, update, index+1)
-        update()
-
-    def append_thinking_bubble_analysis(self):
-        bubble_bg = "#444444"
-        text_color = "#FFFFFF"
-        bubble_frame = ctk.CTkFrame(self.ai_scroll_frame, fg_color=bubble_bg, corner_radius=10)
-        thinking_label = ctk.CTkLabel(bubble_frame, text="Thinking", font=("Segoe UI", 18),
-                                      text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
-        thinking_label.pack(anchor="w", padx=5, pady=(0,5))
-        bubble_frame.pack(fill="x", padx=10, pady=5, anchor="w")
-        self.animate_thinking(thinking_label)
-        self.ai_scroll_frame.update_idletasks()
-        return bubble_frame
-
-    def append_deepseek_response_analysis(self, message):
-        pattern = re.compile(r"<\s*think\s*>(.*?)<\s*/\s*think\s*>", re.DOTALL | re.IGNORECASE)
-        match = pattern.search(message)
-        if match:
-            think_content = match.group(1).strip()
-            main_text = pattern.sub("", message).strip()
-            bubble_bg = "#444444"
-            text_color = "#FFFFFF"
-            bubble_frame = ctk.CTkFrame(self.ai_scroll_frame, fg_color=bubble_bg, corner_radius=10)
-            sender_label = ctk.CTkLabel(bubble_frame, text="Analysis", font=("Segoe UI", 16, "bold"),
-                                        text_color=text_color, anchor="w", padx=5, pady=2)
-            sender_label.pack(anchor="w", padx=5, pady=(5,0))
-            main_label = ctk.CTkLabel(bubble_frame, text=main_text, font=("Segoe UI", 18),
-                                      text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
-            main_label.pack(anchor="w", padx=5, pady=(0,5))
-            toggle_frame = ctk.CTkFrame(bubble_frame, fg_color=bubble_bg)
-            toggle_frame.pack(anchor="w", padx=5, pady=(0,5))
-            details_label = ctk.CTkLabel(toggle_frame, text=think_content, font=("Segoe UI", 16),
-                                          text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
-            details_label.pack_forget()  # Hide details initially.
-            def toggle_details():
-                if details_label.winfo_ismapped():
-                    details_label.pack_forget()
-                    toggle_btn.configure(text="Show Thinking Process")
-                else:
-                    details_label.pack(anchor="w", padx=5, pady=(0,5))
-                    toggle_btn.configure(text="Hide Thinking Process")
-            toggle_btn = ctk.CTkButton(toggle_frame, text="Show Thinking Process", command=toggle_details,
-                                         font=("Segoe UI", 12), fg_color="#1E90FF", hover_color="#1C90EE", text_color="#FFFFFF")
-            toggle_btn.pack(anchor="w", padx=5, pady=(0,5))
-            bubble_frame.pack(fill="x", padx=10, pady=5, anchor="w")
-            self.ai_scroll_frame.update_idletasks()
-        else:
-            self.append_ai_message(message)
+    # -------------------- DUPLICATE FINDER --------------------
+    def find_duplicates(self):
+        if self.finding_duplicates or self.scanning:
+            return
+        if not self.results:
+            messagebox.showinfo("No Data", "Scan a folder before looking for duplicates.")
+            return
+        self.finding_duplicates = True
+        self.dupes_btn.configure(state="disabled")
+        self.status_label.configure(text="Finding duplicates...")
+        threading.Thread(target=self.run_duplicate_scan, args=(self.results,), daemon=True).start()
+
+    def run_duplicate_scan(self, results):
+        groups = []
+        last_update = [0.0]
+
+        def progress(stage, done, total):
+            now = time.time()
+            if done == total or now - last_update[0] > 0.2:
+                last_update[0] = now
+                label = "Comparing file starts/ends" if stage == "partial" else "Hashing candidates"
+                self.safe_after(0, lambda: self.status_label.configure(text=f"{label}: {done:,}/{total:,}"))
+
+        hasher = None
+        try:
+            hasher = FileHasher(self.hash_cache_file)
+            groups = find_duplicates(results, self.duplicate_workers, progress,
+                                     should_stop=lambda: results is not self.results, hasher=hasher)
+            self.logger.info(f"Hash cache: {hasher.hits:,} hits, {hasher.misses:,} files read")
+        except Exception as e:
+            self.logger.error(f"Duplicate search failed: {e}")
+        finally:
+            if hasher is not None:
+                try:
+                    hasher.close()
+                except Exception as e:
+                    self.logger.error(f"Failed to save hash cache: {e}")
+            self.safe_after(0, self.duplicate_scan_complete, results, groups)
+
+    def duplicate_scan_complete(self, results, groups):
+        self.finding_duplicates = False
+        self.dupes_btn.configure(state="normal")
+        if results is not self.results:
+            return  # A new scan started meanwhile.
+        self.duplicate_groups = groups
+        reclaimable = sum(size * (len(paths) - 1) for size, paths in groups)
+        self.status_label.configure(
+            text=f"{len(groups):,} duplicate groups, {humanize.naturalsize(reclaimable)} reclaimable"
+        )
+        self.show_duplicates_window()
+
+    def show_duplicates_window(self):
+        window = ctk.CTkToplevel(self.window)
+        window.title("Duplicate Files")
+        window.geometry("900x600")
+        textbox = ctk.CTkTextbox(window, wrap="none", font=("Segoe UI", 12),
+                                 text_color="#FFFFFF", fg_color="#2A2A2A")
+        if not self.duplicate_groups:
+            textbox.insert("end", "No duplicate files found among the scanned files.")
+        for size, paths in self.duplicate_groups:
+            wasted = humanize.naturalsize(size * (len(paths) - 1))
+            textbox.insert("end", f"{len(paths)} copies of {humanize.naturalsize(size)} ({wasted} reclaimable)\n")
+            for path in paths:
+                textbox.insert("end", f"    {path}\n")
+            textbox.insert("end", "\n")
+        textbox.configure(state="disabled")
+        textbox.pack(fill="both", expand=True, padx=10, pady=10)
+        close_btn = ctk.CTkButton(window, text="Close", command=window.destroy,
+                                  fg_color="#FF4C4C", hover_color="#FF3B3B", text_color="#FFFFFF",
+                                  font=("Segoe UI", 12))
+        close_btn.pack(pady=10)
+
+    # -------------------- TREEMAP --------------------
+    def show_treemap_window(self):
+        if self.dir_tree is None or not self.dir_tree.finalized:
+            messagebox.showinfo("No Data", "Complete a scan to see the folder treemap.")
+            return
+        if self.treemap_window is not None and self.treemap_window.winfo_exists():
+            self.treemap_window.lift()
+            return
+        self.treemap_window = ctk.CTkToplevel(self.window)
+        self.treemap_window.title("Folder Treemap")
+        self.treemap_window.geometry("1000x700")
+        self.treemap_view = TreemapView(self.treemap_window, self, self.dir_tree, fg_color="#2A2A2A")
+        self.treemap_view.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+        close_btn = ctk.CTkButton(self.treemap_window, text="Close", command=self.treemap_window.destroy,
+                                  fg_color="#FF4C4C", hover_color="#FF3B3B", text_color="#FFFFFF",
+                                  font=("Segoe UI", 12))
+        close_btn.pack(pady=10)
+
+    def current_summary(self) -> ScanSummary:
+        # Precomputed when a scan completes; mid-scan, built from the scanner's running counters and top files.
+        summary = self.scan_summary
+        if summary is not None and summary.results is self.results:
+            return summary
+        if self.scanner.results is self.results:
+            return self.scanner.live_summary()
+        return ScanSummary(self.results, self.category_map, self.dir_tree)  # A stopped scan's empty store.
 
     def build_analysis_prompt(self) -> str:
-        if not self.file_map:
+        summary = self.current_summary()
+        if not summary.file_count:
             return "No files scanned yet."
-        total_size = sum(self.file_map.values())
-        file_count = len(self.file_map)
-        sorted_files = sorted(self.file_map.items(), key=lambda x: x[1], reverse=True)
-        top_files = sorted_files[:10]
+        total_size = summary.total_size
+        file_count = summary.file_count
+        top_files = summary.largest_files()
         largest_file_section = [
             f"{i+1}. {os.path.basename(f)} - {humanize.naturalsize(s)} (Location: {f})"
             for i, (f, s) in enumerate(top_files)
         ]
         largest_files_str = "\n".join(largest_file_section)
         category_section = []
-        for cat, (count, sz) in self.category_map.items():
+        for cat, (count, sz) in summary.categories.items():
             category_section.append(f"{cat}: {count} file(s), total {humanize.naturalsize(sz)}")
         category_summary = "\n".join(category_section) if category_section else "No category data available."
+        folder_section = []
+        tree = summary.tree
+        if tree is not None:
+            for dir_id in summary.largest_folders():
+                folder_section.append(
+                    f"{tree.path(dir_id)}: {humanize.naturalsize(tree.total_sizes[dir_id])} "
+                    f"in {tree.total_files[dir_id]:,} file(s)"
+                )
+        folders_str = "\n".join(folder_section) if folder_section else "No folder data available."
         duplicate_section = []
-        for sz, paths in self.size_dict.items():
-            if len(paths) > 1:
-                duplicate_section.append(f"{humanize.naturalsize(sz)}: {len(paths)} files")
-        duplicates_str = ("\nPotential duplicates by size:\n" + "\n".join(duplicate_section)
-                          if duplicate_section else "No obvious duplicates by size.")
+        for sz, paths in self.duplicate_groups[:20]:
+            duplicate_section.append(
+                f"{humanize.naturalsize(sz)}: {len(paths)} identical files, "
+                f"{humanize.naturalsize(sz * (len(paths) - 1))} reclaimable (e.g. {paths[0]})"
+            )
+        duplicates_str = ("\nDuplicate files (verified by content hash):\n" + "\n".join(duplicate_section)
+                          if duplicate_section else "No duplicates found (run Find Duplicates to check).")
         prompt = f"""
 You are an expert disk management AI.
 
@@ -1182,6 +1666,9 @@ You are an expert disk management AI.
 **Category Breakdown:**
 {category_summary}
 
+**Largest folders (all files, including those below the size threshold):**
+{folders_str}
+
 **Duplicate Check:**
 {duplicates_str}
 
@@ -1195,7 +1682,8 @@ including performance trade-offs and bullet-pointed advice.
         if not self.ai_enabled:
             self.show_analysis_error("AI features are disabled")
             return
-        if not self.file_map:
+        # The same check as the chat: a bounded scan's store stays empty until the walk ends.
+        if not self.current_summary().file_count:
             self.show_analysis_error("No files scanned yet")
             return
         self.analyze_btn.configure(state="disabled")
@@ -1203,105 +1691,119 @@ including performance trade-offs and bullet-pointed advice.
 
     def run_analysis(self):
         try:
-            provider = self.ai_provider.get() if hasattr(self, "ai_provider") else "Gemini"
-            if provider == "DeepSeekR1":
-                prompt = self.build_analysis_prompt()
-                thinking_bubble = self.append_thinking_bubble_analysis()
-                results = self.generate_ai_content(prompt)
-                self.safe_after(0, thinking_bubble.destroy)
-                self.safe_after(0, self.append_deepseek_response_analysis, results)
-            else:
-                results = self.generate_ai_content(self.build_analysis_prompt())
-                self.safe_after(0, self.update_analysis_results, results)
+            prompt = self.build_analysis_prompt()
+            self.safe_after(0, self.show_analysis_header)
+            results = self.stream_to_bubble(self.ai_scroll_frame, "#008080", prompt)
+            self.safe_after(0, self.add_analysis_history, results)
         except Exception as e:
             self.logger.error(f"Analysis failed: {e}")
             self.safe_after(0, self.show_analysis_error, str(e))
         finally:
             self.safe_after(0, self.reset_analysis_button)
 
-    def generate_ai_content(self, prompt: str) -> str:
-        provider = self.ai_provider.get() if hasattr(self, "ai_provider") else "Gemini"
-        if provider == "Gemini":
-            if self.model is None:
-                try:
-                    load_dotenv()
-                    api_key = os.getenv("GEMINI_API_KEY")
-                    if not api_key:
-                        # Show API key entry dialog if key not found
-                        api_key = self.show_api_key_dialog()
-                        if not api_key:  # User canceled
-                            raise ValueError("Gemini API key not provided")
-                    genai.configure(api_key=api_key)
-                    self.model = genai.GenerativeModel("gemini-1.5-pro")
-                    self.ai_enabled = True
-                except Exception as e:
-                    self.logger.error(f"Gemini AI initialization failed: {e}")
-                    self.ai_enabled = False
-                    return "Gemini AI is not available."
-
-            try:
-                response = self.model.generate_content(prompt)
-                self.logger.debug(f"Gemini response: {response.text}")
-                return response.text
-            except Exception as e:
-                self.logger.error(f"Gemini API error: {e}")
-                # Check if it's an API key error
-                if "API_KEY_INVALID" in str(e) or "API key not found" in str(e):
-                    # Show API key dialog
+    def get_ai_provider(self, name: str):
+        provider = self.ai_clients.get(name)
+        if provider is None:
+            settings = dict(self.ai_providers[name])
+            if settings["provider"] == "gemini" and not settings.get("api_key"):
+                load_dotenv()
+                api_key = self.gemini_api_key or os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    # Show API key entry dialog if key not found
                     api_key = self.show_api_key_dialog()
-                    if api_key:
-                        # Try again with the new key
-                        try:
-                            genai.configure(api_key=api_key)
-                            self.model = genai.GenerativeModel("gemini-1.5-pro")
-                            response = self.model.generate_content(prompt)
-                            return response.text
-                        except Exception as e2:
-                            self.logger.error(f"Gemini API retry failed: {e2}")
-                            return f"Error: {e2}"
-                    else:
-                        return "API key not provided. Please try again."
-                return f"Error: {e}"
-        elif provider == "DeepSeekR1":
+                    if not api_key:  # User canceled
+                        raise ValueError("Gemini API key not provided")
+                self.gemini_api_key = api_key
+                settings["api_key"] = api_key
+            provider = create_provider(settings)
+            self.ai_clients[name] = provider
+        return provider
+
+    def close_ai_providers(self):
+        for provider in self.ai_clients.values():
+            provider.close()
+        self.ai_clients = {}
+
+    def generate_ai_content(self, prompt: str, on_chunk=None, on_cache_hit=None) -> str:
+        """Ask the selected provider; with on_chunk, the answer is streamed to it piece by piece as well.
+
+        A cached answer is returned (and passed to on_chunk whole) without a
+        request; on_cache_hit, if given, is first called with its age in seconds.
+        """
+        name = self.ai_provider.get() if hasattr(self, "ai_provider") else self.default_ai_provider
+        if name not in self.ai_providers:
+            return "Unknown AI provider."
+        settings = self.ai_providers[name]
+        cache_key = None
+        if self.ai_cache is not None:
+            cache_key = ResponseCache.key(settings["provider"], settings.get("base_url", ""),
+                                          settings.get("model", ""), prompt)
             try:
-                url = f"http://localhost:{self.ollama_port}/api/generate"
-                payload = {
-                    "model": "deepseek-r1",  # Use the 7B model for RTX 3060Ti.
-                    "stream": False,
-                    "prompt": prompt
-                }
-                self.logger.debug(f"Sending request to DeepSeekR1: {payload}")
-                r = requests.post(url, json=payload)
-                self.logger.debug(f"Received HTTP {r.status_code} from DeepSeekR1")
-                if r.status_code == 200:
-                    try:
-                        data = r.json()
-                        self.logger.debug(f"DeepSeekR1 response data: {data}")
-                        return data.get("response", "").strip()
-                    except Exception as json_e:
-                        self.logger.error(f"JSON decode error: {json_e}")
-                        self.logger.debug(f"Response text: {r.text}")
-                        return "DeepSeekR1 response parsing failed."
-                else:
-                    self.logger.error(f"DeepSeekR1 HTTP error: {r.status_code} - {r.text}")
-                    return f"DeepSeekR1 is not available (HTTP error {r.status_code})."
+                cached = self.ai_cache.get(cache_key)
             except Exception as e:
-                self.logger.error(f"DeepSeekR1 HTTP request failed: {e}")
-                return "DeepSeekR1 is not available."
-        else:
-            return "Unknown AI provider."
-
-    def update_analysis_results(self, results: str):
+                self.logger.error(f"AI cache lookup failed: {e}")
+                cached = None
+            if cached is not None:
+                answer, age = cached
+                self.logger.info(f"{name} answer served from cache "
+                                 f"({self.ai_cache.hits:,} hits, {self.ai_cache.misses:,} misses)")
+                if on_cache_hit is not None:
+                    on_cache_hit(age)
+                if on_chunk is not None:
+                    on_chunk(answer)
+                return answer
+        try:
+            provider = self.get_ai_provider(name)
+        except Exception as e:
+            self.logger.error(f"{name} initialization failed: {e}")
+            return f"{name} is not available."
+        try:
+            self.logger.debug(f"Sending request to {name} ({provider.model}, {len(prompt):,} characters)")
+            answer = provider.generate(prompt, on_chunk)
+            self.logger.debug(f"{name} response: {answer}")
+            if cache_key is not None and answer.strip():
+                try:
+                    self.ai_cache.put(cache_key, answer)
+                except Exception as e:
+                    self.logger.error(f"Failed to cache {name} answer: {e}")
+            return answer
+        except ValueError as e:
+            self.logger.error(f"{name} response parsing failed: {e}")
+            return f"{name} response parsing failed."
+        except Exception as e:
+            self.logger.error(f"{name} request failed: {e}")
+            if "API_KEY_INVALID" in str(e) or "API key not found" in str(e):
+                api_key = self.show_api_key_dialog()
+                if not api_key:
+                    return "API key not provided. Please try again."
+                # Try again with the new key and a fresh client.
+                self.gemini_api_key = api_key
+                self.ai_clients.pop(name).close()
+                try:
+                    return self.get_ai_provider(name).generate(prompt, on_chunk)
+                except Exception as e2:
+                    self.logger.error(f"{name} retry failed: {e2}")
+                    return f"Error: {e2}"
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status is not None:
+                return f"{name} is not available (HTTP error {status})."
+            if isinstance(e, OSError):  # Connection problems and timeouts (requests' errors are OSErrors).
+                return f"{name} is not available."
+            return f"Error: {e}"
+
+    def show_analysis_header(self):
         for widget in self.ai_scroll_frame.winfo_children():
             widget.destroy()
-        total_size = sum(self.file_map.values())
+        scan = self.current_summary()
         header = "=== Disk Space Analysis ===\n\n"
-        summary = (f"Total Space Analyzed: {humanize.naturalsize(total_size)}\n"
-                   f"Files Analyzed: {len(self.file_map)}\n\n")
-        full_message = header + summary + "AI Recommendations:\n" + results
-        self.append_ai_message(full_message)
+        summary = (f"Total Space Analyzed: {humanize.naturalsize(scan.total_size)}\n"
+                   f"Files Analyzed: {scan.file_count}\n\n")
+        self.append_ai_message(header + summary + "AI Recommendations follow below.")
+
+    def add_analysis_history(self, results: str):
+        summary = self.current_summary()
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        history_entry = f"--- {timestamp} ---\nTotal Space: {humanize.naturalsize(total_size)} | Files: {len(self.file_map)}\n{results}\n\n"
+        history_entry = f"--- {timestamp} ---\nTotal Space: {humanize.naturalsize(summary.total_size)} | Files: {summary.file_count}\n{results}\n\n"
         self.analysis_history.append(history_entry)
         self.update_history_tab()
 
@@ -1342,185 +1844,189 @@ including performance trade-offs and bullet-pointed advice.
             except Exception as e:
                 self.log_error(f"Failed to export analysis: {e}")
 
+    # -------------------- CHARTS --------------------
     def show_chart_window(self):
-        chart_window = ctk.CTkToplevel(self.window)
-        chart_window.title("Comprehensive File Type Analysis")
-        chart_window.geometry("1000x700")
-        chart_window.grab_set()
         if not self.category_map:
             messagebox.showinfo("No Data", "No category data available to chart.")
             return
-        categories = list(self.category_map.keys())
-        counts = [self.category_map[cat][0] for cat in categories]
-        sizes = [self.category_map[cat][1] for cat in categories]
-        total_count = sum(counts)
-        total_size = sum(sizes)
-        avg_sizes = [s / c if c > 0 else 0 for c, s in zip(counts, sizes)]
-        data = sorted(zip(categories, counts, sizes, avg_sizes), key=lambda x: x[1], reverse=True)
-        if data:
-            categories, counts, sizes, avg_sizes = zip(*data)
+        if self.chart_window is not None and self.chart_window.winfo_exists():
+            self.chart_window.lift()
+            return
+        self.chart_window = ctk.CTkToplevel(self.window)
+        self.chart_window.title("Comprehensive File Type Analysis")
+        self.chart_window.geometry("1000x700")
+        self.chart_window.grab_set()
+        # Packed first so the button keeps its space whatever size the label asks for.
+        close_btn = ctk.CTkButton(self.chart_window, text="Close", command=self.chart_window.destroy,
+                                  fg_color="#FF4C4C", hover_color="#FF3B3B", text_color="#FFFFFF",
+                                  font=("Segoe UI", 12))
+        close_btn.pack(side="bottom", pady=10)
+        # No border, padding or focus ring: the label then asks for exactly the image's size, which is
+        # rendered at the label's size, so showing it does not trigger another <Configure>.
+        self.chart_label = tk.Label(self.chart_window, text="Rendering charts...", bg="#2A2A2A", fg="#FFFFFF",
+                                    font=("Segoe UI", 12), bd=0, padx=0, pady=0, highlightthickness=0)
+        self.chart_label.pack(fill="both", expand=True)
+        self.chart_label.bind("<Configure>", self.on_chart_resize)
+        self.chart_window.bind("<Destroy>", self.on_chart_window_destroy)
+        # Usually rendered in the background when the scan finished.
+        if self.chart_image is not None and self.chart_image[2] == self.chart_data():
+            self.show_chart_image()
         else:
-            categories, counts, sizes, avg_sizes = ([], [], [], [])
-        fig, axs = plt.subplots(2, 2, figsize=(18, 12))
-        fig.patch.set_facecolor('#2A2A2A')
-        def autopct_counts(pct):
-            absolute = int(pct / 100 * total_count)
-            return f"{pct:.1f}%\n({absolute})"
-        axs[0, 0].pie(counts, labels=categories, autopct=autopct_counts, textprops={'color': 'w'},
-                      pctdistance=0.6, labeldistance=1.1)
-        axs[0, 0].set_title("File Count by Type", color='w')
-        axs[0, 0].set_facecolor('#2A2A2A')
-        def autopct_sizes(pct):
-            absolute = humanize.naturalsize(int(pct / 100 * total_size))
-            return f"{pct:.1f}%\n({absolute})"
-        axs[0, 1].pie(sizes, labels=categories, autopct=autopct_sizes, textprops={'color': 'w'},
-                      pctdistance=0.6, labeldistance=1.1)
-        axs[0, 1].set_title("Total Size by Type", color='w')
-        axs[0, 1].set_facecolor('#2A2A2A')
-        bars = axs[1, 0].bar(categories, avg_sizes, color="#1E90FF")
-        axs[1, 0].set_title("Average File Size by Type", color='w')
-        axs[1, 0].set_ylabel("Average Size (bytes)", color='w')
-        axs[1, 0].set_facecolor('#2A2A2A')
-        axs[1, 0].tick_params(axis='x', rotation=45, colors='w', labelsize=10)
-        axs[1, 0].tick_params(axis='y', colors='w', labelsize=10)
-        for bar in bars:
-            height = bar.get_height()
-            axs[1, 0].text(bar.get_x() + bar.get_width()/2, height,
-                           humanize.naturalsize(height),
-                           ha='center', va='bottom', color='w', fontsize=10)
-        cell_text = []
-        rows = []
-        for cat, count, size, avg in zip(categories, counts, sizes, avg_sizes):
-            percent_count = f"{(count/total_count*100):.1f}%" if total_count > 0 else "0%"
-            percent_size = f"{(size/total_size*100):.1f}%" if total_size > 0 else "0%"
-            rows.append(cat)
-            cell_text.append([str(count),
-                              humanize.naturalsize(size),
-                              humanize.naturalsize(avg),
-                              percent_count,
-                              percent_size])
-        col_labels = ["Count", "Total Size", "Avg Size", "Count %", "Size %"]
-        axs[1, 1].axis('tight')
-        axs[1, 1].axis('off')
-        table = axs[1, 1].table(cellText=cell_text, rowLabels=rows, colLabels=col_labels,
-                                 loc='center', cellLoc='center')
-        table.auto_set_font_size(False)
-        table.set_fontsize(10)
-        table.scale(1, 2)
-        axs[1, 1].set_title("Type Details", color='w')
-        plt.tight_layout(pad=3.0)
-        canvas = FigureCanvasTkAgg(fig, master=chart_window)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
-        close_btn = ctk.CTkButton(chart_window, text="Close", command=chart_window.destroy,
-                                   fg_color="#FF4C4C", hover_color="#FF3B3B", text_color="#FFFFFF",
-                                   font=("Segoe UI", 12))
-        close_btn.pack(pady=10)
+            self.render_charts()
 
-    # -------------------- CHATBOT THINKING HELPERS --------------------
-    def animate_thinking_chat(self, label):
-        texts = ["Thinking", "Thinking.", "Thinking..", "Thinking..."]
-        def update(index=0):
-            if label.winfo_exists():
-                label.configure(text=texts[index % len(texts)])
-                self.safe_after(500, update, index+1)
-        update()
-
-    def append_thinking_bubble(self):
-        bubble_bg = "#444444"
-        text_color = "#FFFFFF"
-        bubble_frame = ctk.CTkFrame(self.chat_scroll_frame, fg_color=bubble_bg, corner_radius=10)
-        thinking_label = ctk.CTkLabel(bubble_frame, text="Thinking", font=("Segoe UI", 18),
-                                      text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
-        thinking_label.pack(anchor="w", padx=5, pady=(0,5))
-        bubble_frame.pack(fill="x", padx=10, pady=5, anchor="w")
-        self.animate_thinking_chat(thinking_label)
-        self.chat_scroll_frame.update_idletasks()
-        return bubble_frame
-
-    def append_deepseek_response(self, message):
-        # For Chatbot responses – similar to analysis but using chat_scroll_frame.
-        pattern = re.compile(r"<\s*think\s*>(.*?)<\s*/\s*think\s*>", re.DOTALL | re.IGNORECASE)
-        match = pattern.search(message)
-        if match:
-            think_content = match.group(1).strip()
-            main_text = pattern.sub("", message).strip()
-            bubble_bg = "#444444"
-            text_color = "#FFFFFF"
-            bubble_frame = ctk.CTkFrame(self.chat_scroll_frame, fg_color=bubble_bg, corner_radius=10)
-            sender_label = ctk.CTkLabel(bubble_frame, text="Analysis", font=("Segoe UI", 16, "bold"),
-                                        text_color=text_color, anchor="w", padx=5, pady=2)
-            sender_label.pack(anchor="w", padx=5, pady=(5,0))
-            main_label = ctk.CTkLabel(bubble_frame, text=main_text, font=("Segoe UI", 18),
-                                      text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
-            main_label.pack(anchor="w", padx=5, pady=(0,5))
-            toggle_frame = ctk.CTkFrame(bubble_frame, fg_color=bubble_bg)
-            toggle_frame.pack(anchor="w", padx=5, pady=(0,5))
-            details_label = ctk.CTkLabel(toggle_frame, text=think_content, font=("Segoe UI", 16),
-                                          text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
-            details_label.pack_forget()
-            def toggle_details():
-                if details_label.winfo_ismapped():
-                    details_label.pack_forget()
-                    toggle_btn.configure(text="Show Thinking Process")
-                else:
-                    details_label.pack(anchor="w", padx=5, pady=(0,5))
-                    toggle_btn.configure(text="Hide Thinking Process")
-            toggle_btn = ctk.CTkButton(toggle_frame, text="Show Thinking Process", command=toggle_details,
-                                         font=("Segoe UI", 12), fg_color="#1E90FF", hover_color="#1C90EE", text_color="#FFFFFF")
-            toggle_btn.pack(anchor="w", padx=5, pady=(0,5))
-            bubble_frame.pack(fill="x", padx=10, pady=5, anchor="w")
-            self.chat_scroll_frame.update_idletasks()
-        else:
-            self.append_chat_message("Analysis", message)
+    def chart_data(self) -> dict:
+        return {cat: tuple(values) for cat, values in self.category_map.items()}
 
-    # -------------------- ANALYSIS THINKING HELPERS (for AI Analysis tab) --------------------
-    def append_thinking_bubble_analysis(self):
-        bubble_bg = "#444444"
+    def render_charts(self, size=None):
+        """Render the category charts on a worker thread; chart_rendered() picks them up."""
+        if not self.category_map:
+            return
+        if size is not None:
+            self.chart_size = size
+        self.chart_render_id += 1
+        threading.Thread(target=self.run_chart_render,
+                         args=(self.chart_render_id, self.chart_data(), self.chart_size), daemon=True).start()
+
+    def run_chart_render(self, render_id, data, size):
+        try:
+            with self.chart_lock:
+                if render_id != self.chart_render_id:
+                    return  # A newer render is queued behind this one.
+                if self.charts is None:
+                    # Imports matplotlib, so it happens here rather than on the UI thread.
+                    from deepscan.charts import CategoryCharts
+                    self.charts = CategoryCharts()
+                self.charts.update(data)
+                png = self.charts.render_png(*size)
+        except Exception as e:
+            self.logger.error(f"Chart rendering failed: {e}")
+            return
+        self.safe_after(0, self.chart_rendered, render_id, (size, png, data))
+
+    def chart_rendered(self, render_id, image):
+        if render_id != self.chart_render_id:
+            return
+        self.chart_image = image
+        self.show_chart_image()
+
+    def show_chart_image(self):
+        if self.chart_label is None or self.chart_image is None:
+            return
+        self.chart_photo = tk.PhotoImage(data=base64.b64encode(self.chart_image[1]))
+        self.chart_label.configure(image=self.chart_photo, text="")
+
+    def on_chart_resize(self, event):
+        size = (event.width, event.height)
+        if self.chart_image is not None and self.chart_image[0] == size:
+            return
+        if self.chart_resize_after_id is not None:
+            self.chart_window.after_cancel(self.chart_resize_after_id)
+        self.chart_resize_after_id = self.chart_window.after(200, self.resize_charts, size)
+
+    def resize_charts(self, size):
+        self.chart_resize_after_id = None
+        self.render_charts(size)
+
+    def on_chart_window_destroy(self, event):
+        if event.widget is not self.chart_window:
+            return  # <Destroy> also fires for each child widget.
+        # The figure stays for the next window; only the Tk image is tied to this one.
+        self.chart_window = None
+        self.chart_label = None
+        self.chart_photo = None
+        self.chart_resize_after_id = None
+
+    # -------------------- STREAMING RESPONSE BUBBLES --------------------
+    def stream_to_bubble(self, scroll_frame, bubble_bg, prompt) -> str:
+        """Ask the AI on this worker thread, filling a new bubble as the answer streams in.
+
+        The answer shows as soon as the first tokens arrive; <think> content
+        goes behind a "Show Thinking Process" toggle. Returns the answer
+        without the thinking part.
+        """
+        bubble = {}  # Filled in by create_stream_bubble() on the UI thread.
+        self.safe_after(0, self.create_stream_bubble, bubble, scroll_frame, bubble_bg)
+        splitter = ThinkSplitter()
+        streamed = []
+        last_update = [0.0]
+
+        def on_chunk(text):
+            streamed.append(text)
+            splitter.feed(text)
+            now = time.perf_counter()
+            if now - last_update[0] >= self.stream_update_ms / 1000:
+                last_update[0] = now
+                self.safe_after(0, self.update_stream_bubble, bubble, splitter.answer, splitter.think)
+
+        def on_cache_hit(age):
+            self.safe_after(0, self.mark_bubble_cached, bubble, age)
+
+        text = self.generate_ai_content(prompt, on_chunk=on_chunk, on_cache_hit=on_cache_hit)
+        if text.strip() != "".join(streamed).strip():
+            # Not what was streamed, e.g. an error message: show it after whatever did arrive.
+            splitter.feed("\n\n" + text if streamed else text)
+        splitter.flush()
+        answer = splitter.answer.strip()
+        self.safe_after(0, self.update_stream_bubble, bubble, answer, splitter.think, True)
+        return answer
+
+    def create_stream_bubble(self, bubble, scroll_frame, bubble_bg):
         text_color = "#FFFFFF"
-        bubble_frame = ctk.CTkFrame(self.ai_scroll_frame, fg_color=bubble_bg, corner_radius=10)
-        thinking_label = ctk.CTkLabel(bubble_frame, text="Thinking", font=("Segoe UI", 18),
-                                      text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
-        thinking_label.pack(anchor="w", padx=5, pady=(0,5))
+        bubble_frame = ctk.CTkFrame(scroll_frame, fg_color=bubble_bg, corner_radius=10)
+        sender_label = ctk.CTkLabel(bubble_frame, text="Analysis", font=("Segoe UI", 16, "bold"),
+                                    text_color=text_color, anchor="w", padx=5, pady=2)
+        sender_label.pack(anchor="w", padx=5, pady=(5, 0))
+        main_label = ctk.CTkLabel(bubble_frame, text="Thinking", font=("Segoe UI", 18),
+                                  text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
+        main_label.pack(anchor="w", padx=5, pady=(0, 5))
+        # Packed once the model starts a <think> block.
+        toggle_frame = ctk.CTkFrame(bubble_frame, fg_color=bubble_bg)
+        details_label = ctk.CTkLabel(toggle_frame, text="", font=("Segoe UI", 16),
+                                     text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
+
+        def toggle_details():
+            if details_label.winfo_ismapped():
+                details_label.pack_forget()
+                toggle_btn.configure(text="Show Thinking Process")
+            else:
+                details_label.pack(anchor="w", padx=5, pady=(0, 5))
+                toggle_btn.configure(text="Hide Thinking Process")
+
+        toggle_btn = ctk.CTkButton(toggle_frame, text="Show Thinking Process", command=toggle_details,
+                                   font=("Segoe UI", 12), fg_color="#1E90FF", hover_color="#1C90EE",
+                                   text_color="#FFFFFF")
+        toggle_btn.pack(anchor="w", padx=5, pady=(0, 5))
         bubble_frame.pack(fill="x", padx=10, pady=5, anchor="w")
-        self.animate_thinking(thinking_label)
-        self.ai_scroll_frame.update_idletasks()
-        return bubble_frame
-
-    def append_deepseek_response_analysis(self, message):
-        pattern = re.compile(r"<\s*think\s*>(.*?)<\s*/\s*think\s*>", re.DOTALL | re.IGNORECASE)
-        match = pattern.search(message)
-        if match:
-            think_content = match.group(1).strip()
-            main_text = pattern.sub("", message).strip()
-            bubble_bg = "#444444"
-            text_color = "#FFFFFF"
-            bubble_frame = ctk.CTkFrame(self.ai_scroll_frame, fg_color=bubble_bg, corner_radius=10)
-            sender_label = ctk.CTkLabel(bubble_frame, text="Analysis", font=("Segoe UI", 16, "bold"),
-                                        text_color=text_color, anchor="w", padx=5, pady=2)
-            sender_label.pack(anchor="w", padx=5, pady=(5,0))
-            main_label = ctk.CTkLabel(bubble_frame, text=main_text, font=("Segoe UI", 18),
-                                      text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
-            main_label.pack(anchor="w", padx=5, pady=(0,5))
-            toggle_frame = ctk.CTkFrame(bubble_frame, fg_color=bubble_bg)
-            toggle_frame.pack(anchor="w", padx=5, pady=(0,5))
-            details_label = ctk.CTkLabel(toggle_frame, text=think_content, font=("Segoe UI", 16),
-                                          text_color=text_color, wraplength=600, justify="left", padx=5, pady=5)
-            details_label.pack_forget()  # Hide details initially.
-            def toggle_details():
-                if details_label.winfo_ismapped():
-                    details_label.pack_forget()
-                    toggle_btn.configure(text="Show Thinking Process")
-                else:
-                    details_label.pack(anchor="w", padx=5, pady=(0,5))
-                    toggle_btn.configure(text="Hide Thinking Process")
-            toggle_btn = ctk.CTkButton(toggle_frame, text="Show Thinking Process", command=toggle_details,
-                                         font=("Segoe UI", 12), fg_color="#1E90FF", hover_color="#1C90EE", text_color="#FFFFFF")
-            toggle_btn.pack(anchor="w", padx=5, pady=(0,5))
-            bubble_frame.pack(fill="x", padx=10, pady=5, anchor="w")
-            self.ai_scroll_frame.update_idletasks()
-        else:
-            self.append_ai_message(message)
+        bubble.update(frame=bubble_frame, sender=sender_label, main=main_label, toggle_frame=toggle_frame, details=details_label,
+                      answering=False, done=False)
+        self.animate_stream_bubble(bubble)
+
+    def animate_stream_bubble(self, bubble, index=0):
+        # "Thinking..." until the first answer token; <think> content does not count.
+        if bubble["answering"] or bubble["done"] or not bubble["main"].winfo_exists():
+            return
+        bubble["main"].configure(text="Thinking" + "." * (index % 4))
+        self.safe_after(500, self.animate_stream_bubble, bubble, index + 1)
+
+    def mark_bubble_cached(self, bubble, age):
+        if not bubble or not bubble["frame"].winfo_exists():
+            return
+        bubble["sender"].configure(text=f"Analysis (cached, {humanize.naturaldelta(age)} old)")
+        self.status_label.configure(text="AI answer from cache (the data has not changed)")
+
+    def update_stream_bubble(self, bubble, answer, think, done=False):
+        if not bubble or not bubble["frame"].winfo_exists():
+            return
+        bubble["done"] = done
+        if answer.strip():
+            bubble["answering"] = True
+            bubble["main"].configure(text=answer.strip())
+        elif done:
+            bubble["main"].configure(text="(No answer)")
+        if think.strip():
+            if not bubble["toggle_frame"].winfo_ismapped():
+                bubble["toggle_frame"].pack(anchor="w", padx=5, pady=(0, 5))
+            bubble["details"].configure(text=think.strip())
 
     # -------------------- CHATBOT FUNCTIONALITY --------------------
     def send_chat_message(self):
@@ -1536,14 +2042,15 @@ including performance trade-offs and bullet-pointed advice.
             self.safe_after(0, self.append_chat_message, "Assistant", "AI features are disabled.")
             return
         context = ""
-        if self.file_map:
-            total_size = sum(self.file_map.values())
-            file_count = len(self.file_map)
-            largest_file_path, largest_file_size = max(self.file_map.items(), key=lambda item: item[1])
+        summary = self.current_summary()
+        if summary.file_count and summary.largest_files(1):
+            total_size = summary.total_size
+            file_count = summary.file_count
+            largest_file_path, largest_file_size = summary.largest_files(1)[0]
             largest_file_info = f"{os.path.basename(largest_file_path)} - {humanize.naturalsize(largest_file_size)} (Location: {largest_file_path})"
             category_summary = "\n".join(
                 f"{cat}: {data[0]} files, {humanize.naturalsize(data[1])}"
-                for cat, data in self.category_map.items()
+                for cat, data in summary.categories.items()
             )
             context = (
                 f"Current scan results:\n"
@@ -1558,15 +2065,7 @@ including performance trade-offs and bullet-pointed advice.
             "You are a helpful disk management assistant. Use the following context from the current scan to answer the query:\n"
             f"{context}\nUser query: {user_message}"
         )
-        provider = self.ai_provider.get() if hasattr(self, "ai_provider") else "Gemini"
-        if provider == "DeepSeekR1":
-            thinking_bubble = self.append_thinking_bubble()
-            answer = self.generate_ai_content(prompt)
-            self.safe_after(0, thinking_bubble.destroy)
-            self.safe_after(0, self.append_deepseek_response, answer)
-        else:
-            answer = self.generate_ai_content(prompt)
-            self.safe_after(0, self.append_chat_message, "Analysis", answer)
+        self.stream_to_bubble(self.chat_scroll_frame, "#444444", prompt)
 
     def append_chat_message(self, sender, message):
         if sender == "User":
@@ -1589,6 +2088,12 @@ including performance trade-offs and bullet-pointed advice.
 
     # -------------------- EXIT APPLICATION --------------------
     def exit_app(self):
+        self.close_ai_providers()
+        if self.ai_cache is not None:
+            self.ai_cache.close()
+        with self.chart_lock:
+            if self.charts is not None:
+                self.charts.close()
         self.window.destroy()
 
     # -------------------- MAIN LOOP --------------------
@@ -0,0 +1,18 @@
+"""DeepScanAi scan engine.
+
+Everything needed to scan a tree without the Tk GUI: directory walkers,
+the DiskScanner engine, the persistent listing and hash caches, the
+columnar result store and its precomputed summary, the per-directory
+size tree and its treemap layout, and duplicate detection. Run ``python -m deepscan``
+for the command-line interface.
+"""
+from .cache import ScanCache
+from .categories import EXTENSION_CATEGORIES, CategoryIndex, load_categories
+from .duplicates import FileHasher, find_duplicates, full_hash, partial_hash
+from .results import ResultFilter, ScanResults, TopFiles
+from .prune import DEFAULT_PRUNE_RULES, IGNORE_FILE, PruneRules
+from .scanner import DiskScanner, ScanEstimator, ScanSession, scan_shard
+from .summary import ScanSummary
+from .tree import DirectoryTree
+from .treemap import TreemapLayout, squarify
+from .walkers import SCAN_ENGINES, ParallelWalker, legacy_walk, list_directory, parallel_walk, scandir_walk
@@ -0,0 +1,157 @@
+"""Persistent cache of directory listings used to speed up rescans."""
+import json
+import os
+import sqlite3
+import time
+
+from .walkers import list_directory
+
+# -------------------- PERSISTENT SCAN CACHE --------------------
+class ScanCache:
+    """SQLite cache of directory listings keyed by directory mtime.
+
+    A directory's mtime changes whenever an entry is created, removed or
+    renamed in it, so a rescan stats each directory once and only re-lists
+    the ones whose mtime differs from the cached listing. A file rewritten
+    in place (a VM image, a database, a log) does not touch its directory's
+    mtime, so the cached files at or above restat_size (normally the scan's
+    min_file_size, i.e. the files that get reported) are stat'ed again on
+    every hit. Smaller files keep their cached size until something else
+    changes in their directory; that only affects folder totals, unless one
+    grows past restat_size in place.
+
+    Rows under the scan root are loaded into memory (as undecoded JSON) at
+    the start of a scan, lookups are lock-free dict reads so the parallel
+    walker can share one cache, and new listings are written back in a
+    single transaction by save(), which also drops rows for directories
+    under the root that were not seen again.
+    """
+    # Listings of directories modified this recently may still be changing
+    # within the same mtime tick, so they are stored as always-stale.
+    RACY_WINDOW_NS = 2_000_000_000
+
+    def __init__(self, db_path, restat_size=0):
+        self.db_path = db_path
+        self.restat_size = restat_size
+        self.root = None
+        self.entries = {}  # path -> (mtime_ns, dirs_json, files_json)
+        self.updates = {}  # path -> (mtime_ns, dirs, files) listed this scan
+        self.seen = set()  # directories visited this scan
+        self.hits = 0
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, "
+            "dirs TEXT NOT NULL, files TEXT NOT NULL)"
+        )
+        return conn
+
+    @staticmethod
+    def subtree_bounds(root):
+        # Every path below root sorts between root + sep and root + (sep + 1).
+        prefix = root.rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def load(self, root, recursive=True):
+        """Start a walk of root: reset the per-walk state and read root's cached listings.
+
+        Reloading is skipped when root's rows are already in memory and
+        nothing has been saved since, e.g. for the scan after a counting pass.
+        """
+        root = os.fspath(root)
+        self.seen = set()
+        self.hits = 0
+        if self.root == root:
+            return
+        self.root = root
+        self.entries.clear()
+        conn = self.connect()
+        try:
+            if recursive:
+                low, high = self.subtree_bounds(root)
+                rows = conn.execute(
+                    "SELECT path, mtime_ns, dirs, files FROM dirs "
+                    "WHERE path = ? OR (path >= ? AND path < ?)",
+                    (root, low, high),
+                )
+            else:
+                rows = conn.execute("SELECT path, mtime_ns, dirs, files FROM dirs WHERE path = ?", (root,))
+            for path, mtime_ns, dirs, files in rows:
+                self.entries[path] = (mtime_ns, dirs, files)
+        finally:
+            conn.close()
+
+    def list_directory(self, root, skip_dir=None):
+        try:
+            mtime_ns = os.stat(root).st_mtime_ns
+        except OSError:
+            return None
+        self.seen.add(root)
+        cached = self.entries.get(root)
+        if cached is not None and cached[0] == mtime_ns:
+            self.hits += 1
+            dirs = json.loads(cached[1])
+            files = [tuple(f) for f in json.loads(cached[2])]
+            if self.restat(root, files):
+                self.updates[root] = (cached[0], dirs, files)
+        else:
+            listing = list_directory(root)
+            if listing is None:
+                return None
+            dirs, files = listing
+            if time.time_ns() - mtime_ns < self.RACY_WINDOW_NS:
+                mtime_ns = -1
+            self.updates[root] = (mtime_ns, dirs, files)
+        if skip_dir is not None:
+            dirs = [d for d in dirs if not skip_dir(os.path.join(root, d))]
+        return dirs, files
+
+    def restat(self, root, files) -> bool:
+        """Refresh size and mtime of the files at or above restat_size in place; True if any changed."""
+        changed = False
+        restat_size = self.restat_size
+        for i, (name, size, mtime) in enumerate(files):
+            if size < restat_size:
+                continue
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            if st.st_size != size or st.st_mtime != mtime:
+                files[i] = (name, st.st_size, st.st_mtime)
+                changed = True
+        return changed
+
+    def merge(self, updates, seen, hits=0):
+        """Fold in listings gathered by another ScanCache (e.g. a worker process)."""
+        self.updates.update(updates)
+        self.seen.update(seen)
+        self.hits += hits
+
+    def save(self, prune=True):
+        """Write new listings; with prune, drop rows for directories no longer present."""
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dirs (path, mtime_ns, dirs, files) VALUES (?, ?, ?, ?)",
+                    (
+                        (path, mtime_ns, json.dumps(dirs), json.dumps(files, separators=(",", ":")))
+                        for path, (mtime_ns, dirs, files) in self.updates.items()
+                    ),
+                )
+                if prune and self.root is not None:
+                    conn.execute("CREATE TEMP TABLE seen (path TEXT PRIMARY KEY)")
+                    conn.executemany("INSERT OR IGNORE INTO seen (path) VALUES (?)", ((p,) for p in self.seen))
+                    low, high = self.subtree_bounds(self.root)
+                    conn.execute(
+                        "DELETE FROM dirs WHERE (path = ? OR (path >= ? AND path < ?)) "
+                        "AND path NOT IN (SELECT path FROM seen)",
+                        (self.root, low, high),
+                    )
+        finally:
+            conn.close()
+        self.updates.clear()
+        self.root = None  # The rows in entries are out of date now; the next load() reads them again.
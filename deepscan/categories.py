@@ -0,0 +1,105 @@
+"""File type categories and the extension -> category index used to classify files."""
+import json
+import os
+
+DEFAULT_CATEGORY = "Others"
+
+# Ultra-specific file type categories.
+EXTENSION_CATEGORIES = {
+    "Images": {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".svg"},
+    "Videos": {".mp4", ".mkv", ".mov", ".avi", ".wmv", ".flv", ".mpeg", ".mpg", ".3gp", ".webm"},
+    "Audio": {".mp3", ".wav", ".flac", ".aac", ".ogg", ".m4a", ".wma"},
+    "Documents": {".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".ods", ".odp"},
+    "Text": {".txt", ".rtf", ".md", ".log", ".csv"},
+    "Code": {".py", ".js", ".html", ".htm", ".css", ".java", ".c", ".cpp", ".cs", ".rb", ".php", ".sql", ".sh", ".go", ".rs", ".swift", ".kt", ".ts"},
+    "Executables": {".exe", ".msi", ".bat", ".cmd"},
+    "Libraries": {".dll", ".so", ".dylib"},
+    "Archives": {".zip", ".rar", ".7z", ".tar", ".gz", ".iso", ".cab", ".arj", ".lzma", ".xz",
+                 ".tar.gz", ".tar.bz2", ".tar.xz", ".tar.zst", ".tgz", ".tbz2", ".txz"},
+    "Others": set()
+}
+
+
+class CategoryIndex:
+    """Inverted extension -> category index.
+
+    Built once per scan, so classifying a file costs one dict lookup per
+    candidate suffix instead of a set test per category. Compound
+    extensions such as ".tar.gz" are supported: the longest configured
+    suffix of a name wins, so "backup.tar.gz" is checked against ".tar.gz"
+    before ".gz". Extensions added later override earlier ones, which is
+    how user categories take extensions away from the built-in ones.
+    """
+
+    def __init__(self, categories=None):
+        self.by_ext = {}
+        self.names = []  # Category names in definition order.
+        self.max_dots = 1  # Dots in the longest configured extension.
+        for category, extensions in (categories if categories is not None else EXTENSION_CATEGORIES).items():
+            self.add(category, extensions)
+        if DEFAULT_CATEGORY not in self.names:
+            self.names.append(DEFAULT_CATEGORY)
+
+    @staticmethod
+    def normalize(extension: str) -> str:
+        extension = extension.strip().lower()
+        return extension if extension.startswith(".") else "." + extension
+
+    def add(self, category: str, extensions):
+        if category not in self.names:
+            self.names.append(category)
+        for extension in extensions:
+            extension = self.normalize(extension)
+            self.by_ext[extension] = category
+            self.max_dots = max(self.max_dots, extension.count("."))
+
+    def classify(self, name: str) -> str:
+        """Return the category of a file name."""
+        lower = name.lower()
+        dot = lower.rfind(".")
+        if dot <= 0:
+            return DEFAULT_CATEGORY  # No extension, or a leading dot marking a hidden file.
+        by_ext = self.by_ext
+        if self.max_dots > 1:
+            # Walk outwards through compound suffixes; the longest one configured wins.
+            compound = None
+            start = dot
+            for _ in range(self.max_dots - 1):
+                start = lower.rfind(".", 0, start)
+                if start <= 0:
+                    break
+                found = by_ext.get(lower[start:])
+                if found is not None:
+                    compound = found
+            if compound is not None:
+                return compound
+        return by_ext.get(lower[dot:], DEFAULT_CATEGORY)
+
+
+def load_categories(path):
+    """Return the built-in categories merged with the user categories in a JSON file.
+
+    The file maps category names to lists of extensions, for example
+    {"Disk Images": [".vmdk", ".qcow2"], "Archives": [".tar.lz4"]}. A new
+    name adds a category, an existing name extends it, and an extension
+    listed here is moved out of whatever built-in category held it.
+    A missing file just yields the built-in categories.
+    """
+    categories = {category: set(extensions) for category, extensions in EXTENSION_CATEGORIES.items()}
+    if path is None or not os.path.exists(path):
+        return categories
+    with open(path, "r", encoding="utf-8") as f:
+        user = json.load(f)
+    if not isinstance(user, dict):
+        raise ValueError(f"{path}: expected an object mapping category names to extension lists")
+    for category, extensions in user.items():
+        if isinstance(extensions, str) or not all(isinstance(e, str) for e in extensions):
+            raise ValueError(f"{path}: extensions for {category!r} must be a list of strings")
+        extensions = {CategoryIndex.normalize(e) for e in extensions}
+        for existing in categories.values():
+            existing -= extensions
+        categories.setdefault(category, set()).update(extensions)
+    return categories
+
+
+DEFAULT_INDEX = CategoryIndex()
@@ -0,0 +1,163 @@
+"""Category charts drawn off-screen with matplotlib's Agg backend.
+
+Not imported by the package itself: matplotlib is only needed by the GUI.
+The figure is a plain matplotlib.figure.Figure rather than a pyplot one,
+so it is never registered with pyplot and lives exactly as long as its
+CategoryCharts. All figure work happens on whichever thread calls
+update() and render_png(); callers serialize those calls.
+"""
+import io
+
+import humanize
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+BACKGROUND = "#2A2A2A"
+TEXT_COLOR = "w"
+BAR_COLOR = "#1E90FF"
+TABLE_COLUMNS = ["Count", "Total Size", "Avg Size", "Count %", "Size %"]
+
+
+def chart_rows(category_map: dict) -> list:
+    """(category, count, total_size, average_size) rows, most files first."""
+    rows = [(cat, count, size, size / count if count > 0 else 0)
+            for cat, (count, size) in category_map.items()]
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows
+
+
+class CategoryCharts:
+    """The four category charts (two pies, a bar chart and a table) on one reused Figure.
+
+    update() redraws only what changed: nothing when the data is the same,
+    and when only the numbers change for the same categories, the bars,
+    their labels and the table cells are updated in place instead of
+    rebuilt. The pies are always redrawn since their wedges depend on
+    every value. render_png() lays the figure out for a pixel size and
+    returns it as PNG bytes for the GUI to show.
+    """
+
+    def __init__(self, dpi: int = 100):
+        self.figure = Figure(dpi=dpi, facecolor=BACKGROUND)
+        FigureCanvasAgg(self.figure)
+        axes = self.figure.subplots(2, 2)
+        self.count_pie, self.size_pie = axes[0]
+        self.avg_bars, self.details = axes[1]
+        for ax in (self.count_pie, self.size_pie, self.avg_bars, self.details):
+            ax.set_facecolor(BACKGROUND)
+        self.rows = None
+        self.bars = None
+        self.bar_labels = []
+        self.table = None
+        self.rendered_size = None  # (width, height) the layout was last computed for.
+
+    def update(self, category_map: dict) -> bool:
+        """Show category_map; returns False if it is what the figure already shows."""
+        rows = chart_rows(category_map)
+        if rows == self.rows:
+            return False
+        same_categories = self.rows is not None and [row[0] for row in rows] == [row[0] for row in self.rows]
+        self.rows = rows
+        self.rendered_size = None
+        self.draw_pies(rows)
+        if same_categories and self.bars is not None:
+            self.update_bars(rows)
+            self.update_table(rows)
+        else:
+            self.draw_bars(rows)
+            self.draw_table(rows)
+        return True
+
+    def draw_pies(self, rows):
+        categories = [row[0] for row in rows]
+        total_count = sum(row[1] for row in rows)
+        total_size = sum(row[2] for row in rows)
+
+        def autopct_counts(pct):
+            return f"{pct:.1f}%\n({int(pct / 100 * total_count)})"
+
+        def autopct_sizes(pct):
+            return f"{pct:.1f}%\n({humanize.naturalsize(int(pct / 100 * total_size))})"
+
+        for ax, values, autopct, title in (
+            (self.count_pie, [row[1] for row in rows], autopct_counts, "File Count by Type"),
+            (self.size_pie, [row[2] for row in rows], autopct_sizes, "Total Size by Type"),
+        ):
+            ax.clear()
+            if sum(values) > 0:
+                ax.pie(values, labels=categories, autopct=autopct, textprops={"color": TEXT_COLOR},
+                       pctdistance=0.6, labeldistance=1.1)
+            ax.set_title(title, color=TEXT_COLOR)
+
+    def draw_bars(self, rows):
+        ax = self.avg_bars
+        ax.clear()
+        self.bars = ax.bar([row[0] for row in rows], [row[3] for row in rows], color=BAR_COLOR)
+        self.bar_labels = [
+            ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), humanize.naturalsize(bar.get_height()),
+                    ha="center", va="bottom", color=TEXT_COLOR, fontsize=10)
+            for bar in self.bars
+        ]
+        ax.set_title("Average File Size by Type", color=TEXT_COLOR)
+        ax.set_ylabel("Average Size (bytes)", color=TEXT_COLOR)
+        ax.tick_params(axis="x", rotation=45, colors=TEXT_COLOR, labelsize=10)
+        ax.tick_params(axis="y", colors=TEXT_COLOR, labelsize=10)
+
+    def update_bars(self, rows):
+        for bar, label, row in zip(self.bars, self.bar_labels, rows):
+            bar.set_height(row[3])
+            label.set_y(row[3])
+            label.set_text(humanize.naturalsize(row[3]))
+        self.avg_bars.relim()
+        self.avg_bars.autoscale_view()
+
+    @staticmethod
+    def table_cells(rows) -> list:
+        total_count = sum(row[1] for row in rows)
+        total_size = sum(row[2] for row in rows)
+        return [
+            [str(count), humanize.naturalsize(size), humanize.naturalsize(avg),
+             f"{(count / total_count * 100):.1f}%" if total_count > 0 else "0%",
+             f"{(size / total_size * 100):.1f}%" if total_size > 0 else "0%"]
+            for cat, count, size, avg in rows
+        ]
+
+    def draw_table(self, rows):
+        ax = self.details
+        ax.clear()
+        ax.axis("off")
+        self.table = None
+        if rows:
+            self.table = ax.table(cellText=self.table_cells(rows), rowLabels=[row[0] for row in rows],
+                                  colLabels=TABLE_COLUMNS, loc="center", cellLoc="center")
+            self.table.auto_set_font_size(False)
+            self.table.set_fontsize(10)
+            self.table.scale(1, 2)
+        ax.set_title("Type Details", color=TEXT_COLOR)
+
+    def update_table(self, rows):
+        if self.table is None:
+            return self.draw_table(rows)
+        # Row 0 holds the column labels.
+        for r, cells in enumerate(self.table_cells(rows), start=1):
+            for c, text in enumerate(cells):
+                self.table[r, c].get_text().set_text(text)
+
+    def render_png(self, width: int, height: int) -> bytes:
+        """The charts as a PNG of width x height pixels."""
+        figure = self.figure
+        if self.rendered_size != (width, height):
+            figure.set_size_inches(max(width, 100) / figure.dpi, max(height, 100) / figure.dpi)
+            figure.tight_layout(pad=2.0)
+            self.rendered_size = (width, height)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png", facecolor=BACKGROUND)
+        return buffer.getvalue()
+
+    def close(self):
+        """Drop every artist; the figure is unusable afterwards."""
+        self.figure.clear()
+        self.rows = None
+        self.bars = None
+        self.bar_labels = []
+        self.table = None
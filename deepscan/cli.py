@@ -0,0 +1,199 @@
+"""Command-line entry point: headless scans and walker benchmarks.
+
+    python -m deepscan scan PATH [--min-size 10M] [--format jsonl|csv] [--output FILE] [--top N]
+    python -m deepscan bench PATH [--max-workers 16] [--repeat 3]
+
+`scan` streams one record per kept file (path, size, mtime, category) as
+it is found and prints a summary to stderr, so it can run on a box
+without a display or from cron. With --top N it keeps only the N largest
+files overall and per category, in memory that does not grow with the
+number of files (--cache is ignored then), and writes them largest
+first at the end. `bench` times the directory walkers
+against each other on one tree; run it once beforehand (or drop the OS
+page cache) for warm-cache or cold-cache numbers respectively.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+from .cache import ScanCache
+from .categories import CategoryIndex, load_categories
+from .prune import IGNORE_FILE
+from .scanner import DiskScanner
+from .walkers import SCAN_ENGINES, legacy_walk, parallel_walk, scandir_walk
+
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d*)?)\s*([KMGT]?)(?:I?B)?\s*$", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(text: str) -> int:
+    """Parse a size such as 4096, 512K, 10M or 1.5GB (binary units) into bytes."""
+    match = SIZE_PATTERN.match(text)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def write_jsonl(out, rows):
+    for root, name, size, mtime, category in rows:
+        record = {"path": os.path.join(root, name), "size": size, "mtime": mtime, "category": category}
+        out.write(json.dumps(record) + "\n")
+
+
+def write_csv(out, rows):
+    writer = csv.writer(out)
+    writer.writerow(["path", "size", "mtime", "category"])
+    for root, name, size, mtime, category in rows:
+        writer.writerow([os.path.join(root, name), size, mtime, category])
+
+
+WRITERS = {"jsonl": write_jsonl, "csv": write_csv}
+
+
+def run_scan(args) -> int:
+    if not os.path.isdir(args.path):
+        print(f"deepscan: not a directory: {args.path}", file=sys.stderr)
+        return 2
+    try:
+        category_index = CategoryIndex(load_categories(args.categories))
+    except (OSError, ValueError) as e:
+        print(f"deepscan: cannot load categories: {e}", file=sys.stderr)
+        return 2
+    scanner = DiskScanner(
+        min_file_size=args.min_size,
+        skip_system_dirs=not args.include_system_dirs,
+        engine=args.engine,
+        workers=args.workers,
+        processes=args.processes,
+        top_k=args.top,
+        cache=ScanCache(args.cache) if args.cache else None,
+        keep_results=False,
+        category_index=category_index,
+        exclude=args.exclude,
+        include=args.include,
+        build_tree=args.folders > 0 and not args.quiet,  # The folder list is part of the summary.
+    )
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.top > 0:
+            for _ in scanner.iter_files(args.path):
+                pass
+            rows = ((os.path.dirname(path), os.path.basename(path), size, mtime, category)
+                    for size, path, mtime, category in scanner.top_files.entries())
+        else:
+            rows = scanner.iter_files(args.path)
+        WRITERS[args.format](out, rows)
+        out.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); stop without a traceback.
+        scanner.stop()
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except KeyboardInterrupt:
+        scanner.stop()
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if not args.quiet:
+        print(
+            f"deepscan: kept {scanner.matched:,} of {scanner.files_seen:,} files, "
+            f"{scanner.total_size:,} bytes, {scanner.walk_elapsed:.2f}s "
+            f"({scanner.files_per_second():,.0f} files/sec, engine={scanner.engine})",
+            file=sys.stderr,
+        )
+        for category, (count, size) in sorted(scanner.categories.items(), key=lambda item: -item[1][1]):
+            print(f"  {category}: {count:,} files, {size:,} bytes", file=sys.stderr)
+        tree = scanner.tree
+        if tree is not None and tree.finalized:
+            print("Largest folders (all files):", file=sys.stderr)
+            for dir_id in tree.largest(args.folders + 1)[1:]:
+                print(f"  {tree.path(dir_id)}: {tree.total_files[dir_id]:,} files, "
+                      f"{tree.total_sizes[dir_id]:,} bytes", file=sys.stderr)
+    return 0
+
+
+def time_walk(walker, path, repeat):
+    best = None
+    files = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        files = 0
+        for root, dirs, entries in walker(path):
+            files += len(entries)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return files, best
+
+
+def worker_counts(max_workers):
+    n = 1
+    while n < max_workers:
+        yield n
+        n *= 2
+    yield max_workers
+
+
+def run_bench(args) -> int:
+    """Time the single-threaded walkers and the parallel walker at 1, 2, 4, ... threads."""
+    runs = [("walk", legacy_walk), ("scandir", scandir_walk)]
+    for n in worker_counts(max(1, args.max_workers)):
+        runs.append((f"parallel x{n}", lambda p, n=n: parallel_walk(p, workers=n)))
+
+    print(f"{'engine':<14}{'files':>12}{'seconds':>10}{'files/sec':>14}")
+    for name, walker in runs:
+        files, elapsed = time_walk(walker, args.path, args.repeat)
+        rate = files / elapsed if elapsed > 0 else 0
+        print(f"{name:<14}{files:>12,}{elapsed:>10.2f}{rate:>14,.0f}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="deepscan", description="Headless DeepScanAi disk scanner.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="Scan a tree and stream the files found")
+    scan.add_argument("path", help="Directory tree to scan")
+    scan.add_argument("--min-size", type=parse_size, default=0,
+                      help="Only report files at least this large, e.g. 500K, 10M, 2G (default: 0)")
+    scan.add_argument("--format", choices=sorted(WRITERS), default="jsonl", help="Output format (default: jsonl)")
+    scan.add_argument("--top", type=int, default=0, metavar="N",
+                      help="Bounded memory: only report the N largest files overall and per category "
+                           "(disables --cache)")
+    scan.add_argument("--output", "-o", help="Write records to this file instead of stdout")
+    scan.add_argument("--engine", choices=sorted(SCAN_ENGINES) + ["process"], default="parallel",
+                      help="Directory walker (default: parallel)")
+    scan.add_argument("--workers", type=int, default=8, help="Threads for the parallel engine (default: 8)")
+    scan.add_argument("--processes", type=int, default=None,
+                      help="Worker processes for the process engine (default: CPU count)")
+    scan.add_argument("--cache", metavar="DB", help="Directory listing cache to reuse between runs")
+    scan.add_argument("--categories", metavar="JSON",
+                      help='Custom categories, e.g. {"Disk Images": [".vmdk", ".qcow2"]}, merged over the built-in ones')
+    scan.add_argument("--include-system-dirs", action="store_true",
+                      help="Do not skip the default system directories (e.g. /proc, /sys, /dev on Linux)")
+    scan.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                      help="Skip directories matching a .gitignore-style pattern (repeatable); "
+                           f"{IGNORE_FILE} in the scan root is read as well")
+    scan.add_argument("--include", action="append", default=[], metavar="PATTERN",
+                      help="Scan directories matching this pattern even if another rule excludes them (repeatable)")
+    scan.add_argument("--folders", type=int, default=0, metavar="N",
+                      help="Also print the N largest folders by cumulative size, counting every file")
+    scan.add_argument("--quiet", "-q", action="store_true", help="Do not print the summary (totals, categories, --folders) to stderr")
+    scan.set_defaults(func=run_scan)
+
+    bench = commands.add_parser("bench", help="Benchmark the directory walkers on one tree")
+    bench.add_argument("path", help="Directory tree to walk")
+    bench.add_argument("--max-workers", type=int, default=os.cpu_count() or 4,
+                       help="Largest worker count for the parallel walker")
+    bench.add_argument("--repeat", type=int, default=3, help="Runs per configuration (best is reported)")
+    bench.set_defaults(func=run_bench)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
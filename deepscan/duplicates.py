@@ -0,0 +1,226 @@
+"""Content hashing and duplicate-file detection."""
+import concurrent.futures
+import hashlib
+import itertools
+import mmap
+import os
+import sqlite3
+import threading
+
+# -------------------- DUPLICATE DETECTION --------------------
+PARTIAL_HASH_BYTES = 4096      # Bytes hashed from each end of a file in the partial stage.
+HASH_CHUNK_BYTES = 1024 * 1024
+MMAP_MIN_BYTES = 16 * 1024 * 1024  # Files at least this large are hashed through mmap.
+MMAP_SLICE_BYTES = 64 * 1024 * 1024
+
+
+def partial_hash(path: str, size: int):
+    """Hash the first and last PARTIAL_HASH_BYTES of a file.
+
+    Returns (digest, file_id) where file_id is (st_dev, st_ino), so hard
+    links to the same data can be told apart from real copies.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        h.update(f.read(PARTIAL_HASH_BYTES))
+        if size > 2 * PARTIAL_HASH_BYTES:
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            h.update(f.read(PARTIAL_HASH_BYTES))
+        elif size > PARTIAL_HASH_BYTES:
+            h.update(f.read())
+    return h.hexdigest(), (st.st_dev, st.st_ino)
+
+
+def full_hash(path: str) -> str:
+    """Hash a whole file, through mmap for large files and a reused buffer otherwise."""
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_MIN_BYTES:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for offset in range(0, size, MMAP_SLICE_BYTES):
+                            h.update(view[offset:offset + MMAP_SLICE_BYTES])
+                    finally:
+                        view.release()
+                return h.hexdigest()
+            except (OSError, ValueError):
+                h = hashlib.blake2b(digest_size=32)  # mmap unsupported here; fall back to reads.
+                f.seek(0)
+        buf = bytearray(HASH_CHUNK_BYTES)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+class FileHasher:
+    """Partial and full content hashes with a persistent SQLite cache.
+
+    Digests are stored per path together with the file's size, mtime_ns
+    and inode at hashing time; a lookup only counts as a hit when all three
+    still match, so unchanged files are never read again across scans and
+    duplicate runs. The cache can be shared by hashing threads; new digests
+    are buffered and written in one transaction by flush().
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "inode INTEGER NOT NULL, partial TEXT, full TEXT)"
+        )
+        self.lock = threading.Lock()
+        self.pending = {}  # path -> [size, mtime_ns, inode, partial, full]
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, path):
+        """Stat path and return (row, file_id); row holds any cached digests still valid."""
+        st = os.stat(path)
+        key = [st.st_size, st.st_mtime_ns, st.st_ino]
+        with self.lock:
+            row = self.pending.get(path)
+            if row is None:
+                found = self.conn.execute(
+                    "SELECT size, mtime_ns, inode, partial, full FROM hashes WHERE path = ?", (path,)
+                ).fetchone()
+                row = list(found) if found is not None else None
+        if row is None or row[:3] != key:
+            row = key + [None, None]
+        return row, (st.st_dev, st.st_ino)
+
+    def store(self, path, row):
+        with self.lock:
+            self.pending[path] = row
+
+    def partial(self, path: str, size: int):
+        row, file_id = self.lookup(path)
+        if row[3] is None:
+            self.misses += 1
+            row[3] = partial_hash(path, size)[0]
+            self.store(path, row)
+        else:
+            self.hits += 1
+        return row[3], file_id
+
+    def full(self, path: str) -> str:
+        row, file_id = self.lookup(path)
+        if row[4] is None:
+            self.misses += 1
+            row[4] = full_hash(path)
+            self.store(path, row)
+        else:
+            self.hits += 1
+        return row[4]
+
+    def flush(self):
+        with self.lock:
+            rows = [(path, *row) for path, row in self.pending.items()]
+            self.pending.clear()
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO hashes (path, size, mtime_ns, inode, partial, full) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def find_duplicates(results, workers=4, progress=None, should_stop=None, hasher=None):
+    """Find files with identical content among the rows of a ScanResults store.
+
+    Stage 1 groups rows by size; only sizes shared by two or more files go
+    on. Stage 2 hashes the first and last few KB of those candidates and
+    regroups by (size, partial hash), which rules out nearly every
+    same-size pair cheaply. Stage 3 fully hashes the survivors; files no
+    larger than the partial window are already fully covered by stage 2.
+    Hashing runs on a thread pool, through hasher (a FileHasher) when one
+    is given so unchanged files are not re-read. progress(stage, done,
+    total) is called from the calling thread, and should_stop() aborts
+    early when it returns true. Returns [(size, [paths])] sorted by
+    reclaimable bytes, largest first.
+    """
+    partial = hasher.partial if hasher is not None else partial_hash
+    full = hasher.full if hasher is not None else full_hash
+    by_size = {}
+    sizes = results.sizes
+    for i in results.indices():
+        size = sizes[i]
+        if size > 0:
+            if size not in by_size:
+                by_size[size] = []
+            by_size[size].append(i)
+    candidates = [(sizes[i], results.path(i)) for rows in by_size.values() if len(rows) > 1 for i in rows]
+    by_size = None
+
+    def run_stage(stage, items, func):
+        # Keep a bounded number of files in flight so millions of candidates
+        # never turn into millions of pending futures.
+        hashed = []
+        in_flight = {}
+        done = 0
+        queued = iter(items)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                for item in itertools.islice(queued, workers * 32 - len(in_flight)):
+                    in_flight[pool.submit(func, item)] = item
+                if not in_flight:
+                    # Back in (size, path) order, whichever worker finished first.
+                    hashed.sort(key=lambda entry: entry[0])
+                    return hashed
+                finished, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                if should_stop is not None and should_stop():
+                    for future in in_flight:
+                        future.cancel()
+                    return None
+                for future in finished:
+                    item = in_flight.pop(future)
+                    try:
+                        hashed.append((item, future.result()))
+                    except OSError:
+                        pass  # Unreadable or vanished since the scan.
+                done += len(finished)
+                if progress is not None:
+                    progress(stage, done, len(items))
+
+    hashed = run_stage("partial", candidates, lambda item: partial(item[1], item[0]))
+    if hashed is None:
+        return []
+    groups = {}
+    seen_files = set()
+    for (size, path), (digest, file_id) in hashed:
+        if file_id in seen_files:
+            continue  # Hard link to data already counted; the first path in sorted order stands for it.
+        seen_files.add(file_id)
+        groups.setdefault((size, digest), []).append(path)
+    survivors = []
+    duplicates = []
+    for (size, digest), paths in groups.items():
+        if len(paths) < 2:
+            continue
+        if size <= PARTIAL_HASH_BYTES:
+            duplicates.append((size, paths))
+        else:
+            survivors.extend((size, path) for path in paths)
+
+    hashed = run_stage("full", survivors, lambda item: full(item[1]))
+    if hashed is None:
+        return []
+    groups = {}
+    for (size, path), digest in hashed:
+        groups.setdefault((size, digest), []).append(path)
+    duplicates.extend((size, paths) for (size, digest), paths in groups.items() if len(paths) > 1)
+    duplicates.sort(key=lambda group: group[0] * (len(group[1]) - 1), reverse=True)
+    return duplicates
@@ -0,0 +1,312 @@
+"""LLM providers behind one interface (Gemini, Ollama and OpenAI-compatible servers), and a cache of their answers.
+
+Not imported by the package itself. Importing it is cheap: requests,
+google.generativeai and asyncio are imported by the first provider or
+coroutine that needs them, so the GUI can read provider settings at
+startup without paying for any of them.
+"""
+import abc
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Responses worth retrying: Ollama answers 503 while a model is still loading.
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class LLMProvider(abc.ABC):
+    """One model on one backend.
+
+    generate() blocks and suits worker threads; agenerate() is the same
+    request as a coroutine, run in the event loop's default executor, so
+    several requests (to one provider or to several) can be awaited
+    together, e.g. with generate_concurrently(). With on_chunk, the answer
+    is streamed: each new piece of text is passed to on_chunk, on the
+    thread doing the request, as it arrives.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abc.abstractmethod
+    def generate(self, prompt: str, on_chunk=None) -> str:
+        """The whole answer to prompt; with on_chunk, each new piece is also passed to it as it arrives."""
+
+    async def agenerate(self, prompt: str, on_chunk=None) -> str:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.generate, prompt, on_chunk))
+
+    def close(self):
+        pass
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through google.generativeai, imported when the provider is created."""
+
+    def __init__(self, model: str = "gemini-1.5-pro", api_key: str = None):
+        super().__init__(model)
+        import google.generativeai as genai
+        genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self.client = genai.GenerativeModel(model)
+
+    def generate(self, prompt: str, on_chunk=None) -> str:
+        if on_chunk is None:
+            return self.client.generate_content(prompt).text
+        parts = []
+        for chunk in self.client.generate_content(prompt, stream=True):
+            text = chunk.text
+            parts.append(text)
+            on_chunk(text)
+        return "".join(parts)
+
+
+class HTTPProvider(LLMProvider):
+    """A provider reached over HTTP through one pooled, keep-alive requests.Session.
+
+    The session keeps up to pool_size connections open, so consecutive
+    requests skip the TCP handshake. Every request carries a connect and a
+    read timeout; the read timeout bounds each wait for data (the next
+    streamed chunk), not the whole answer, so a long generation is fine
+    while a hung server fails within read_timeout. Refused connections and
+    RETRY_STATUSES responses are retried up to retries times with
+    exponential backoff (backoff, 2 * backoff, ...). A request that already
+    reached the server and then timed out is not retried, since that would
+    start the whole generation again.
+    """
+
+    def __init__(self, model: str, base_url: str, api_key: str = None, connect_timeout: float = 3.05,
+                 read_timeout: float = 120.0, retries: int = 3, backoff: float = 0.5, pool_size: int = 4):
+        super().__init__(model)
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,  # The last response is returned and raise_for_status() reports it.
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def post(self, path: str, payload: dict, stream: bool):
+        """POST payload as JSON; raises requests.HTTPError for an error status."""
+        response = self.session.post(f"{self.base_url}{path}", json=payload, stream=stream, timeout=self.timeout)
+        if not response.ok:
+            with response:
+                response.raise_for_status()
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+class OllamaProvider(HTTPProvider):
+    """An Ollama server's /api/generate, streamed as NDJSON."""
+
+    def __init__(self, model: str = "deepseek-r1", base_url: str = "http://localhost:11434", **kwargs):
+        super().__init__(model, base_url, **kwargs)
+
+    def generate(self, prompt: str, on_chunk=None) -> str:
+        payload = {"model": self.model, "prompt": prompt, "stream": on_chunk is not None}
+        with self.post("/api/generate", payload, on_chunk is not None) as response:
+            if on_chunk is None:
+                data = response.json()
+                if "error" in data:
+                    raise RuntimeError(data["error"])
+                return data.get("response", "").strip()
+            return self.read_stream(response, on_chunk)
+
+    @staticmethod
+    def read_stream(response, on_chunk) -> str:
+        """Collect an NDJSON stream: one JSON object per line, each carrying the next piece of "response"."""
+        parts = []
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            if "error" in data:
+                raise RuntimeError(data["error"])
+            piece = data.get("response", "")
+            if piece:
+                parts.append(piece)
+                on_chunk(piece)
+            if data.get("done"):
+                break
+        return "".join(parts).strip()
+
+
+class OpenAICompatibleProvider(HTTPProvider):
+    """Any server implementing OpenAI's /chat/completions (llama.cpp, vLLM, LM Studio, ...).
+
+    base_url includes the API version, e.g. http://localhost:8000/v1.
+    Streamed answers arrive as server-sent events, one "data: {...}" line
+    per delta, ending with "data: [DONE]".
+    """
+
+    def __init__(self, model: str = "local-model", base_url: str = "http://localhost:8000/v1", **kwargs):
+        super().__init__(model, base_url, **kwargs)
+
+    def generate(self, prompt: str, on_chunk=None) -> str:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": on_chunk is not None,
+        }
+        with self.post("/chat/completions", payload, on_chunk is not None) as response:
+            if on_chunk is None:
+                return response.json()["choices"][0]["message"]["content"].strip()
+            return self.read_stream(response, on_chunk)
+
+    @staticmethod
+    def read_stream(response, on_chunk) -> str:
+        parts = []
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue  # Blank separators and ": keep-alive" comments.
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            event = json.loads(data)
+            if "error" in event:
+                raise RuntimeError(event["error"])
+            choices = event.get("choices") or [{}]
+            piece = (choices[0].get("delta") or {}).get("content")
+            if piece:
+                parts.append(piece)
+                on_chunk(piece)
+        return "".join(parts).strip()
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "ollama": OllamaProvider,
+    "openai": OpenAICompatibleProvider,
+}
+
+
+def create_provider(settings: dict) -> LLMProvider:
+    """Build a provider from settings: "provider" (a PROVIDERS key) plus its constructor arguments."""
+    settings = dict(settings)
+    kind = settings.pop("provider", None)
+    if kind not in PROVIDERS:
+        raise ValueError(f"Unknown provider {kind!r}; expected one of {', '.join(PROVIDERS)}")
+    return PROVIDERS[kind](**settings)
+
+
+def load_provider_settings(path: str, defaults: dict) -> dict:
+    """Provider settings by display name: defaults, with the JSON file at path merged over them.
+
+    The file maps names to settings, e.g.
+    {"Fast box": {"provider": "openai", "model": "qwen2.5", "base_url": "http://10.0.0.5:8000/v1"}};
+    a name already in defaults only needs the keys it changes. A missing
+    file is fine; anything else that is not such a mapping raises ValueError.
+    """
+    providers = {name: dict(settings) for name, settings in defaults.items()}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return providers
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected an object mapping provider names to settings")
+    for name, settings in data.items():
+        if not isinstance(settings, dict):
+            raise ValueError(f"{path}: settings for {name!r} must be an object")
+        merged = providers.get(name, {})
+        merged.update(settings)
+        if merged.get("provider") not in PROVIDERS:
+            raise ValueError(f"{path}: {name!r} needs a provider, one of {', '.join(PROVIDERS)}")
+        providers[name] = merged
+    return providers
+
+
+class ResponseCache:
+    """Model answers in SQLite, keyed by a SHA-256 of (provider, endpoint, model, prompt).
+
+    Prompts built from a scan embed its totals, largest files and
+    categories, so they double as a fingerprint of the scan: asking again
+    about unchanged data is a hit, and a new or changed scan is a miss. The
+    endpoint (a server's base_url) keeps servers that happen to use the
+    same model name apart. Only the digest is stored, not the prompt. Entries older than ttl seconds
+    are dropped, and past max_entries the least recently used go first.
+    The cache can be shared by worker threads.
+    """
+
+    def __init__(self, db_path, ttl: float = 7 * 24 * 3600, max_entries: int = 500):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(provider: str, endpoint: str, model: str, prompt: str) -> str:
+        digest = hashlib.sha256()
+        for part in (provider, endpoint, model, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """(response, age in seconds) for key, or None if it is missing or expired."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            with self.conn:
+                if row is not None and now - row[1] > self.ttl:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return row[0], now - row[1]
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self.conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self.conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+async def generate_concurrently(jobs: list) -> list:
+    """Await several (provider, prompt) requests at once; answers or exceptions come back in order."""
+    import asyncio
+    return await asyncio.gather(*(provider.agenerate(prompt) for provider, prompt in jobs),
+                                return_exceptions=True)
@@ -0,0 +1,163 @@
+"""Directory pruning rules: per-OS system defaults, .deepscanignore files and --exclude/--include."""
+import os
+import re
+import sys
+
+IGNORE_FILE = ".deepscanignore"
+
+# Directories skipped by default when "Skip System Dirs" is on. Patterns
+# without a slash match a directory name anywhere in the tree; patterns
+# with one are matched against the whole path from the filesystem root
+# (Windows paths are matched as "/C:/...", so "*:/Windows" is any drive).
+if sys.platform.startswith("win"):
+    DEFAULT_PRUNE_RULES = [
+        "*:/Windows",
+        "*:/Program Files",
+        "*:/Program Files (x86)",
+        "AppData",
+        "System Volume Information",
+        "$Recycle.Bin",
+    ]
+elif sys.platform == "darwin":
+    DEFAULT_PRUNE_RULES = [
+        "/dev",
+        "/System/Volumes",
+        "/private/var/vm",
+        ".Spotlight-V100",
+        ".fseventsd",
+        ".Trashes",
+    ]
+else:
+    # Pseudo-filesystems: enumerating them is slow, and sizes there are meaningless.
+    DEFAULT_PRUNE_RULES = ["/proc", "/sys", "/dev", "/run"]
+
+CASE_SENSITIVE = os.name != "nt"
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore-style glob into a regex body.
+
+    "*" and "?" stay within one path component, "**" crosses components
+    and "[...]" is a character class ("[!...]" negated).
+    """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class PruneRules:
+    """Compiled directory pruning rules, callable as skip_dir(path).
+
+    Rules follow .gitignore conventions: a pattern without a slash matches
+    a directory name at any depth; a pattern with a slash (a leading one
+    included) is anchored at the rule's base directory; "!" re-includes a
+    directory an earlier rule excluded, and the last matching rule wins.
+    Since the walkers consult the rules before descending, nothing below a
+    pruned directory is ever listed, so a rule cannot re-include a child
+    of a pruned parent.
+
+    Consecutive rules of the same kind are merged into one block holding a
+    set of literal names plus one regex each for name and path patterns,
+    so a directory costs a couple of lookups per block, not one per rule.
+    """
+
+    def __init__(self, patterns=(), base=""):
+        self.patterns = []  # (pattern, base) in the order they were added.
+        self.blocks = []    # [include, literal names, name regexes, path regexes]
+        self.compiled = None
+        for pattern in patterns:
+            self.add(pattern, base)
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        path = path.replace(os.sep, "/") if os.sep != "/" else path
+        if not path.startswith("/"):
+            path = "/" + path  # "C:/x" -> "/C:/x", so anchored rules see a leading slash.
+        return path if CASE_SENSITIVE else path.lower()
+
+    def add(self, pattern: str, base: str = ""):
+        """Add one rule. Blank lines and "#" comments are ignored."""
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith("#"):
+            return
+        self.patterns.append((pattern, base))
+        include = pattern.startswith("!")
+        if include:
+            pattern = pattern[1:]
+        pattern = pattern.rstrip("/")  # Every candidate is a directory anyway.
+        if not pattern:
+            return
+        if not CASE_SENSITIVE:
+            pattern = pattern.lower()
+        if not self.blocks or self.blocks[-1][0] != include:
+            self.blocks.append([include, set(), [], []])
+        block = self.blocks[-1]
+        if "/" not in pattern:
+            if re.search(r"[*?\[]", pattern):
+                block[2].append(glob_to_regex(pattern))
+            else:
+                block[1].add(pattern)
+        else:
+            prefix = self.normalize(base).rstrip("/") if base else ""
+            block[3].append(re.escape(prefix) + "/" + glob_to_regex(pattern.lstrip("/")))
+        self.compiled = None
+
+    def load_ignore_file(self, path: str, base: str = None):
+        """Add the rules of an ignore file, anchored at its directory. A missing file is fine."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return
+        base = os.path.dirname(os.path.abspath(path)) if base is None else base
+        for line in lines:
+            self.add(line, base)
+
+    def compile(self):
+        self.compiled = [
+            (include, names,
+             re.compile("(?:" + "|".join(name_res) + r")\Z") if name_res else None,
+             re.compile("(?:" + "|".join(path_res) + r")\Z") if path_res else None)
+            for include, names, name_res, path_res in self.blocks
+        ]
+        return self.compiled
+
+    def __call__(self, path: str) -> bool:
+        compiled = self.compiled if self.compiled is not None else self.compile()
+        path = self.normalize(path)
+        name = path[path.rfind("/") + 1:]
+        for include, names, name_re, path_re in reversed(compiled):
+            if name in names or (name_re is not None and name_re.match(name)) \
+                    or (path_re is not None and path_re.match(path)):
+                return not include
+        return False
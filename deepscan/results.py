@@ -0,0 +1,279 @@
+"""Columnar storage for scan results and the filter/sort engine over it."""
+import array
+import heapq
+import itertools
+import os
+
+# -------------------- SCAN RESULT STORE --------------------
+class ScanResults:
+    """Columnar store for the files a scan keeps.
+
+    Each file is one row across parallel columns: size (array 'q'), mtime
+    (array 'd'), category id (array 'H') and directory id (array 'I'),
+    plus its base name. Directory paths and category names are interned in
+    small tables, so a full path string is only built when a row is read.
+    Deleted rows are tombstoned in `alive` so row indices stay stable.
+    """
+
+    def __init__(self):
+        self.sizes = array.array("q")
+        self.mtimes = array.array("d")
+        self.cat_ids = array.array("H")
+        self.dir_ids = array.array("I")
+        self.names = []
+        self.alive = bytearray()
+        self.dirs = []
+        self.dir_index = {}
+        self.categories = []
+        self.category_index = {}
+        self.live_count = 0
+        self.live_size = 0
+
+    def __len__(self):
+        return self.live_count
+
+    def directory_id(self, root: str) -> int:
+        dir_id = self.dir_index.get(root)
+        if dir_id is None:
+            dir_id = self.dir_index[root] = len(self.dirs)
+            self.dirs.append(root)
+        return dir_id
+
+    def category_id(self, category: str) -> int:
+        cat_id = self.category_index.get(category)
+        if cat_id is None:
+            cat_id = self.category_index[category] = len(self.categories)
+            self.categories.append(category)
+        return cat_id
+
+    def add(self, dir_id: int, name: str, size: int, mtime: float, category: str) -> int:
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.cat_ids.append(self.category_id(category))
+        self.dir_ids.append(dir_id)
+        self.names.append(name)
+        self.alive.append(1)
+        self.live_count += 1
+        self.live_size += size
+        return len(self.names) - 1
+
+    def merge(self, other: "ScanResults"):
+        """Append the live rows of another store (e.g. one built by a worker process)."""
+        dir_map = [self.directory_id(d) for d in other.dirs]
+        cat_map = [self.category_id(c) for c in other.categories]
+        keep = other.alive
+        self.sizes.extend(itertools.compress(other.sizes, keep))
+        self.mtimes.extend(itertools.compress(other.mtimes, keep))
+        self.cat_ids.extend(cat_map[c] for c in itertools.compress(other.cat_ids, keep))
+        self.dir_ids.extend(dir_map[d] for d in itertools.compress(other.dir_ids, keep))
+        self.names.extend(itertools.compress(other.names, keep))
+        self.alive.extend(b"\x01" * other.live_count)
+        self.live_count += other.live_count
+        self.live_size += other.live_size
+
+    def path(self, index: int) -> str:
+        return os.path.join(self.dirs[self.dir_ids[index]], self.names[index])
+
+    def category(self, index: int) -> str:
+        return self.categories[self.cat_ids[index]]
+
+    def total_size(self) -> int:
+        return self.live_size
+
+    def indices(self) -> list:
+        return list(itertools.compress(range(len(self.alive)), self.alive))
+
+    def by_category(self) -> dict:
+        """Map category name -> live row indices, in scan order."""
+        groups = {}
+        cat_ids = self.cat_ids
+        for i in self.indices():
+            cat_id = cat_ids[i]
+            if cat_id not in groups:
+                groups[cat_id] = []
+            groups[cat_id].append(i)
+        return {self.categories[cat_id]: rows for cat_id, rows in groups.items()}
+
+    def largest(self, n: int) -> list:
+        return heapq.nlargest(n, self.indices(), key=self.sizes.__getitem__)
+
+    def find(self, path: str):
+        dir_id = self.dir_index.get(os.path.dirname(path))
+        if dir_id is None:
+            return None
+        name = os.path.basename(path)
+        for i, candidate in enumerate(self.names):
+            if candidate == name and self.dir_ids[i] == dir_id and self.alive[i]:
+                return i
+        return None
+
+    def remove(self, index: int):
+        if self.alive[index]:
+            self.alive[index] = 0
+            self.live_count -= 1
+            self.live_size -= self.sizes[index]
+
+# -------------------- BOUNDED TOP-K --------------------
+class TopFiles:
+    """The k largest files overall and within each category.
+
+    Used instead of a full ScanResults store when memory has to stay fixed
+    however many files a scan sees: at most k entries are held overall and
+    k per category, plus whatever aggregate counters the caller keeps. Each
+    heap is a min-heap of (size, path, mtime, category), so a file smaller
+    than both heaps' current minimum is rejected with two comparisons and
+    its path string is never built.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.overall = []
+        self.by_category = {}
+
+    def offer(self, size: int, root: str, name: str, mtime: float, category: str):
+        k = self.k
+        overall = self.overall
+        heap = self.by_category.get(category)
+        if heap is None:
+            heap = self.by_category[category] = []
+        fits_overall = len(overall) < k or size > overall[0][0]
+        fits_category = len(heap) < k or size > heap[0][0]
+        if not (fits_overall or fits_category):
+            return
+        entry = (size, os.path.join(root, name), mtime, category)
+        if fits_overall:
+            self.push(overall, entry)
+        if fits_category:
+            self.push(heap, entry)
+
+    def push(self, heap: list, entry: tuple):
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        else:
+            heapq.heapreplace(heap, entry)
+
+    def merge(self, other: "TopFiles"):
+        for entry in other.overall:
+            if len(self.overall) < self.k or entry[0] > self.overall[0][0]:
+                self.push(self.overall, entry)
+        for category, entries in other.by_category.items():
+            heap = self.by_category.setdefault(category, [])
+            for entry in entries:
+                if len(heap) < self.k or entry[0] > heap[0][0]:
+                    self.push(heap, entry)
+
+    def entries(self) -> list:
+        """Every kept file once, largest first."""
+        unique = {entry[1]: entry for entry in self.overall}
+        for heap in self.by_category.values():
+            for entry in heap:
+                unique[entry[1]] = entry
+        return sorted(unique.values(), reverse=True)
+
+    def to_results(self) -> ScanResults:
+        results = ScanResults()
+        for size, path, mtime, category in self.entries():
+            results.add(results.directory_id(os.path.dirname(path)), os.path.basename(path), size, mtime, category)
+        return results
+
+# -------------------- FILTER & SORT ENGINE --------------------
+class ResultFilter:
+    """Incremental filter and sort over one ScanResults store.
+
+    Lower-cased base names and one ascending row order (plus its rank
+    table) per sort key are built once, on first use, and reused for every
+    query. When the new filter text contains the previous one, only the
+    previous matches are re-tested, since anything that matches the longer
+    text also matched the shorter one. The store may still be growing (a
+    query made mid-scan); all of this is dropped once rows have been added.
+    A query only looks at the first len(alive) rows: alive is the column
+    add() appends last, so every column is complete up to there even while
+    another thread is half-way through adding a row.
+    """
+    SORT_KEYS = ("Name", "Size")
+
+    def __init__(self, results: ScanResults):
+        self.results = results
+        self.lower_names = None
+        self.orders = {}  # sort key -> row indices in ascending order
+        self.ranks = {}   # sort key -> position of each row in that order
+        self.last_text = None
+        self.last_matches = None
+        self.row_count = 0  # len(results.alive) the orders and matches were built for.
+
+    def sync(self):
+        row_count = len(self.results.alive)
+        if row_count != self.row_count:
+            self.orders = {}
+            self.ranks = {}
+            self.last_text = None
+            self.last_matches = None
+            self.row_count = row_count
+
+    def order(self, key: str):
+        if key not in self.orders:
+            results = self.results
+            if key == "Name":
+                sort_key = self.names().__getitem__
+            else:
+                sort_key = results.sizes.__getitem__
+            order = array.array("I", sorted(range(self.row_count), key=sort_key))
+            rank = array.array("I", [0]) * len(order)
+            for position, row in enumerate(order):
+                rank[row] = position
+            self.orders[key] = order
+            self.ranks[key] = rank
+        return self.orders[key]
+
+    def names(self):
+        if self.lower_names is None or len(self.lower_names) != self.row_count:
+            self.lower_names = [name.lower() for name in itertools.islice(self.results.names, self.row_count)]
+        return self.lower_names
+
+    def matches(self, text: str):
+        """Live rows whose lower-cased name contains text, or None for "all rows"."""
+        if not text:
+            matches = None
+        else:
+            names = self.names()
+            if self.last_text and self.last_matches is not None and self.last_text in text:
+                candidates = self.last_matches
+            else:
+                candidates = itertools.compress(range(self.row_count), self.results.alive)
+            matches = [i for i in candidates if text in names[i]]
+        self.last_text = text
+        self.last_matches = matches
+        return matches
+
+    def query(self, filter_text: str, sort_order: str) -> list:
+        """Return [(category, rows)] filtered by filter_text and sorted by sort_order."""
+        self.sync()
+        results = self.results
+        key = "Name" if "Name" in sort_order else "Size"
+        descending = "Desc" in sort_order
+        matches = self.matches(filter_text.lower())
+        order = self.order(key)
+        alive = results.alive
+        if matches is None:
+            rows = itertools.compress(order, (alive[i] for i in order))
+        elif len(matches) < len(order) // 4:
+            rows = sorted((i for i in matches if alive[i]), key=self.ranks[key].__getitem__)
+        else:
+            mask = bytearray(len(alive))
+            for i in matches:
+                mask[i] = alive[i]
+            rows = itertools.compress(order, (mask[i] for i in order))
+        groups = {}
+        cat_ids = results.cat_ids
+        for i in rows:
+            cat_id = cat_ids[i]
+            if cat_id not in groups:
+                groups[cat_id] = []
+            groups[cat_id].append(i)
+        sections = []
+        for cat_id in sorted(groups):
+            group = groups[cat_id]
+            if descending:
+                group.reverse()
+            sections.append((results.categories[cat_id], group))
+        return sections
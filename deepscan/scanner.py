@@ -0,0 +1,528 @@
+"""Progress estimation, the process-pool shard scan and the GUI-independent scan engine."""
+import concurrent.futures
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+from .cache import ScanCache
+from .categories import DEFAULT_INDEX
+from .prune import DEFAULT_PRUNE_RULES, IGNORE_FILE, PruneRules
+from .results import ScanResults, TopFiles
+from .summary import SLACK, TOP_N, ScanSummary
+from .tree import DirectoryTree
+from .walkers import SCAN_ENGINES, list_directory, parallel_walk, scandir_walk
+
+logger = logging.getLogger(__name__)
+
+LEADERS = TOP_N + SLACK  # Largest rows tracked during an unbounded walk, for ScanSummary.
+
+# -------------------- SINGLE-PASS PROGRESS ESTIMATE --------------------
+class ScanEstimator:
+    """Estimates the total file count of a tree while it is being walked.
+
+    Each visited directory reports how many subdirectories and files it
+    holds. With a mean fan-out f < 1 (subdirectories found per directory
+    visited), every directory still pending is expected to root a subtree
+    of 1 / (1 - f) directories, each holding the mean number of files seen
+    so far. When the scan root is a mount point, the used inode count from
+    statvfs is used instead, scaled by the file/directory ratio seen so far.
+    """
+    MAX_SUBTREE_FACTOR = 20
+
+    def __init__(self, path=None):
+        self.dirs_visited = 0
+        self.dirs_discovered = 1  # The scan root itself.
+        self.files_seen = 0
+        self.shards_done = 0
+        self.shards_total = 0
+        self.inode_hint = self.used_inodes(path) if path is not None else None
+
+    @staticmethod
+    def used_inodes(path):
+        if not hasattr(os, "statvfs"):
+            return None
+        try:
+            if not os.path.ismount(path):
+                return None
+            st = os.statvfs(path)
+        except OSError:
+            return None
+        used = st.f_files - st.f_ffree
+        return used if used > 0 else None
+
+    def observe(self, dir_count: int, file_count: int):
+        self.dirs_visited += 1
+        self.dirs_discovered += dir_count
+        self.files_seen += file_count
+
+    def observe_shard(self, shard_count: int, file_count: int, dir_count: int):
+        """Record one finished shard of a process-pool scan out of shard_count."""
+        self.shards_total = shard_count
+        self.shards_done += 1
+        self.dirs_visited += dir_count
+        self.files_seen += file_count
+
+    def estimate(self) -> int:
+        if self.dirs_visited == 0:
+            return self.inode_hint or 0
+        if self.inode_hint:
+            file_ratio = self.files_seen / (self.files_seen + self.dirs_visited)
+            estimate = self.inode_hint * file_ratio
+        elif self.shards_done:
+            estimate = self.files_seen * self.shards_total / self.shards_done
+        else:
+            pending = self.dirs_discovered - self.dirs_visited
+            fan_out = (self.dirs_discovered - 1) / self.dirs_visited
+            if fan_out < 1:
+                subtree = min(1 / (1 - fan_out), self.MAX_SUBTREE_FACTOR)
+            else:
+                subtree = self.MAX_SUBTREE_FACTOR
+            files_per_dir = self.files_seen / self.dirs_visited
+            estimate = self.files_seen + pending * subtree * files_per_dir
+        return max(int(estimate), self.files_seen)
+
+# -------------------- PROCESS-POOL SHARD SCAN --------------------
+def scan_shard(top, min_file_size, prune_rules=None, top_k=0, recursive=True, cache_file=None,
+               category_index=None, build_tree=False):
+    """Scan one shard of a tree in a worker process.
+
+    The whole per-file loop (stat data, threshold, category detection, heap
+    maintenance) runs here, and only compact aggregates go back to the
+    parent: per-category counters plus either a ScanResults store with the
+    files above min_file_size or, when top_k > 0, just the shard's TopFiles.
+    With recursive=False only top itself is listed, which is used for the
+    files that sit directly in the scan root. With a
+    cache_file, the shard reads its part of the ScanCache and returns the
+    listings it had to refresh for the parent to save. prune_rules and
+    category_index are the parent's PruneRules and CategoryIndex (no
+    pruning and the built-in categories when None). With build_tree, dirs
+    lists (directory, file count, size of all its files) for every listing,
+    for the parent's DirectoryTree.
+    """
+    skip = prune_rules or None
+    classify = (category_index or DEFAULT_INDEX).classify
+    cache = None
+    if cache_file is not None:
+        cache = ScanCache(cache_file, restat_size=min_file_size)
+        cache.load(top, recursive)
+    result = {
+        "files_seen": 0,
+        "dirs_seen": 0,
+        "matched": 0,
+        "total_size": 0,
+        "categories": {},
+        "results": ScanResults(),
+        "top": TopFiles(top_k) if top_k > 0 else None,
+        "dirs": [],
+        "cache_updates": {},
+        "cache_seen": set(),
+        "cache_hits": 0,
+    }
+    if recursive:
+        listings = scandir_walk(top, skip, cache)
+    else:
+        listing = list_directory(top, cache=cache)
+        listings = [(top, listing[0], listing[1])] if listing is not None else []
+    categories = result["categories"]
+    results = result["results"] if top_k <= 0 else None
+    top_files = result["top"]
+    tree_dirs = result["dirs"] if build_tree else None
+    for root, dirs, files in listings:
+        result["dirs_seen"] += 1
+        result["files_seen"] += len(files)
+        if tree_dirs is not None:
+            tree_dirs.append((root, len(files), sum(f[1] for f in files)))
+        dir_id = None
+        for name, size, mtime in files:
+            if size < min_file_size:
+                continue
+            cat = classify(name)
+            if cat not in categories:
+                categories[cat] = [0, 0]
+            categories[cat][0] += 1
+            categories[cat][1] += size
+            result["matched"] += 1
+            result["total_size"] += size
+            if top_files is not None:
+                top_files.offer(size, root, name, mtime, cat)
+            else:
+                if dir_id is None:
+                    dir_id = results.directory_id(root)
+                results.add(dir_id, name, size, mtime, cat)
+    if cache is not None:
+        result["cache_updates"] = cache.updates
+        result["cache_seen"] = cache.seen
+        result["cache_hits"] = cache.hits
+    return result
+
+# -------------------- SCAN ENGINE --------------------
+class DiskScanner:
+    """Walks a tree and collects the files at or above min_file_size.
+
+    This is the GUI-independent half of a scan. The GUI runs it on a worker
+    thread and samples snapshot() on a timer for progress; the command-line
+    entry point streams iter_files() straight to its output. Counters,
+    category totals and the ScanResults store all belong to the current scan.
+
+    Memory use is set by the mode. By default every kept file goes into the
+    store. With top_k > 0 the scanner is bounded: during the walk it keeps
+    only a TopFiles (the top_k largest files overall and per category) next
+    to the full counters, and results is built from it when the walk ends;
+    the listing cache is not used then, since it holds every file in
+    memory. The directory tree, if built, still grows with the number of
+    directories.
+    With keep_results=False files are only streamed.
+
+    With build_tree, tree is a DirectoryTree with the cumulative size and
+    file count of every directory walked, below the threshold or not. Once
+    a walk completes, summary holds its totals, largest files and folders.
+    """
+
+    def __init__(self, min_file_size=0, skip_system_dirs=True, engine="parallel", workers=8,
+                 processes=None, top_k=0, cache=None, keep_results=True, category_index=None,
+                 exclude=(), include=(), build_tree=True):
+        self.min_file_size = min_file_size
+        self.skip_system_dirs = skip_system_dirs  # Apply DEFAULT_PRUNE_RULES.
+        self.exclude = list(exclude)  # Extra prune patterns, e.g. from --exclude.
+        self.include = list(include)  # Patterns re-included over everything else.
+        self.prune_rules = PruneRules()
+        self.engine = engine  # Key into SCAN_ENGINES, or "process" for one worker process per shard.
+        self.workers = workers  # Threads used by the "parallel" engine.
+        self.processes = processes or os.cpu_count() or 1
+        self.top_k = top_k  # > 0 keeps only the top_k largest files overall and per category.
+        self.cache = cache  # Optional ScanCache shared with later scans.
+        if top_k > 0 and cache is not None:
+            # The cache holds every listing under the root in memory, which a bounded scan cannot afford.
+            logger.info("Listing cache disabled for a bounded (top_k) scan")
+            self.cache = None
+        self.keep_results = keep_results
+        self.build_tree = build_tree
+        self.category_index = category_index or DEFAULT_INDEX
+        self.scanning = False  # True while count_files() or iter_files() runs.
+        self.cancelled = threading.Event()  # Set by stop(); a stopped scanner stays stopped.
+        self.phase = "idle"  # "counting", "scanning" or "done".
+        self.counted = 0  # Files found so far by count_files().
+        self.files_seen = 0  # Every file walked, kept or not.
+        self.matched = 0
+        self.total_size = 0
+        self.total_items = 0  # Exact total from count_files(); 0 means estimate instead.
+        self.categories = {}  # category -> [count, total_size].
+        self.results = ScanResults()
+        self.top_files = TopFiles(top_k) if top_k > 0 else None
+        self.tree = None  # DirectoryTree of the last scan, finalized when the walk ends.
+        self.summary = None  # ScanSummary of the last complete scan, when results are kept.
+        self.leaders = []  # Min-heap of (size, row) of the LEADERS largest rows in results so far.
+        self.estimator = None
+        self.walk_start = None
+        self.walk_elapsed = 0
+        self.completed = False
+
+    def stop(self):
+        """Ask the scan to stop; safe from any thread. The walk ends within one directory."""
+        self.cancelled.set()
+
+    def release(self):
+        """Drop everything collected so far, e.g. after a cancelled scan."""
+        self.results = ScanResults()
+        self.categories = {}
+        self.top_files = None
+        self.tree = None
+        self.summary = None
+        self.leaders = []
+        self.estimator = None
+
+    def load_prune_rules(self, path) -> PruneRules:
+        """Build the rules for a scan of path, lowest precedence first.
+
+        System defaults, then the .deepscanignore file in the scan root,
+        then the exclude patterns and finally the include patterns.
+        """
+        rules = PruneRules(DEFAULT_PRUNE_RULES if self.skip_system_dirs else ())
+        rules.load_ignore_file(os.path.join(path, IGNORE_FILE), path)
+        for pattern in self.exclude:
+            rules.add(pattern)
+        for pattern in self.include:
+            rules.add("!" + pattern.lstrip("!"))
+        return rules
+
+    def walk(self, path):
+        walker = SCAN_ENGINES.get(self.engine, scandir_walk)
+        self.prune_rules = self.load_prune_rules(path)
+        skip = self.prune_rules or None
+        kwargs = {}
+        if walker is parallel_walk:
+            kwargs["workers"] = self.workers
+        if self.cache is not None and walker in (scandir_walk, parallel_walk):
+            self.cache.restat_size = self.min_file_size
+            self.cache.load(path)
+            kwargs["cache"] = self.cache
+        return walker(path, skip, **kwargs)
+
+    def snapshot(self) -> dict:
+        """Current progress counters, safe to call from any thread at any rate.
+
+        The scan loop only bumps plain counters; readers such as the GUI's
+        progress timer sample them here, so the cost of reporting progress
+        does not grow with the scan rate.
+        """
+        estimated = self.total_items <= 0 and self.estimator is not None
+        start = self.walk_start
+        return {
+            "phase": self.phase,
+            "counted": self.counted,
+            "files_seen": self.files_seen,
+            "matched": self.matched,
+            "total_size": self.total_size,
+            "total": self.estimator.estimate() if estimated else self.total_items,
+            "estimated": estimated,
+            "elapsed": time.perf_counter() - start if self.scanning and start is not None else self.walk_elapsed,
+        }
+
+    def count_files(self, path):
+        """Walk path once to get an exact total for progress reporting."""
+        path = os.path.abspath(path)
+        self.scanning = True
+        self.phase = "counting"
+        self.counted = 0
+        try:
+            for root, dirs, files in self.walk(path):
+                if self.cancelled.is_set():
+                    break
+                self.counted += len(files)
+        finally:
+            self.scanning = False
+        self.total_items = self.counted
+        return self.counted
+
+    def scan(self, path):
+        """Run a whole scan and return the ScanResults store."""
+        for _ in self.iter_files(path):
+            pass
+        return self.results
+
+    def iter_files(self, path):
+        """Scan path, yielding (root, name, size, mtime, category) for every kept file.
+
+        The scan cache, if any, is saved when the generator finishes; it is
+        only pruned after a complete walk. In bounded mode the process engine
+        only sends counters and TopFiles back from its workers, so nothing
+        is yielded there. Paths are made absolute first, so
+        anchored prune rules always apply.
+        """
+        path = os.path.abspath(path)
+        self.scanning = True
+        self.phase = "scanning"
+        if self.total_items <= 0:
+            self.estimator = ScanEstimator(path)
+        self.tree = DirectoryTree(path) if self.build_tree else None
+        self.leaders = []
+        failed = True
+        self.walk_start = time.perf_counter()
+        try:
+            if self.engine == "process":
+                yield from self.iter_process_pool(path)
+            else:
+                yield from self.iter_walk(path)
+            failed = False
+        finally:
+            self.walk_elapsed = time.perf_counter() - self.walk_start
+            self.completed = not self.cancelled.is_set() and not failed
+            self.save_cache(prune=self.completed)
+            if self.cancelled.is_set():
+                self.release()
+            else:
+                if self.top_files is not None:
+                    self.results = self.top_files.to_results()
+                if self.tree is not None:
+                    self.tree.finalize()
+                if self.keep_results or self.top_files is not None:
+                    self.summary = ScanSummary(self.results, self.categories, self.tree,
+                                               self.matched, self.total_size, self.leading_files())
+            self.scanning = False
+            self.phase = "done"
+
+    def iter_walk(self, path):
+        min_file_size = self.min_file_size
+        classify = self.category_index.classify
+        top_files = self.top_files
+        store = self.results if self.keep_results and top_files is None else None
+        tree = self.tree
+        cancelled = self.cancelled
+        leader_floor = -1  # A row must be larger than this to be among the leaders.
+        for root, dirs, files in self.walk(path):
+            if cancelled.is_set():
+                return
+            if self.estimator is not None:
+                self.estimator.observe(len(dirs), len(files))
+            if tree is not None:
+                tree.add(root, len(files), sum(f[1] for f in files))
+            dir_id = None
+            self.files_seen += len(files)
+            for name, size, mtime in files:
+                if size < min_file_size:
+                    continue
+                cat = classify(name)
+                self.count_file(cat, size)
+                if top_files is not None:
+                    top_files.offer(size, root, name, mtime, cat)
+                elif store is not None:
+                    if dir_id is None:
+                        dir_id = store.directory_id(root)
+                    row = store.add(dir_id, name, size, mtime, cat)
+                    if size > leader_floor:
+                        leader_floor = self.offer_leader(size, row)
+                yield root, name, size, mtime, cat
+                if cancelled.is_set():
+                    return
+
+    def iter_process_pool(self, path):
+        """Scan each top-level subdirectory of path in its own worker process."""
+        root = path
+        self.prune_rules = self.load_prune_rules(root)
+        skip = self.prune_rules or None
+        if skip is not None and skip(root):
+            return
+        listing = list_directory(root, skip)
+        if listing is None:
+            logger.error(f"Cannot read directory: {root}")
+            return
+        shards = [(root, False)] + [(os.path.join(root, d), True) for d in listing[0]]
+        cache_file = None
+        if self.cache is not None:
+            # Shards read their own part of the cache; the parent only collects updates.
+            self.cache.load(root, recursive=False)
+            cache_file = self.cache.db_path
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.processes)
+        futures = [
+            pool.submit(scan_shard, top, self.min_file_size, skip, self.top_k, recursive, cache_file,
+                        self.category_index, self.build_tree)
+            for top, recursive in shards
+        ]
+        pending = set(futures)
+        try:
+            while pending:
+                # Wake up regularly so a cancel does not wait for a long shard to finish.
+                finished, pending = concurrent.futures.wait(
+                    pending, timeout=0.1, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    if self.cancelled.is_set():
+                        return
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Scan shard failed: {e}")
+                        continue
+                    self.merge_shard(result)
+                    if self.estimator is not None:
+                        self.estimator.observe_shard(len(shards), result["files_seen"], result["dirs_seen"])
+                    shard = result["results"]
+                    for i in shard.indices():
+                        yield (shard.dirs[shard.dir_ids[i]], shard.names[i], shard.sizes[i],
+                               shard.mtimes[i], shard.categories[shard.cat_ids[i]])
+                if self.cancelled.is_set():
+                    return
+        finally:
+            # On cancel, drop queued shards and return without waiting for running ones.
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    def merge_shard(self, result: dict):
+        if self.cache is not None:
+            self.cache.merge(result["cache_updates"], result["cache_seen"], result["cache_hits"])
+        self.files_seen += result["files_seen"]
+        if self.tree is not None:
+            for root, file_count, size in result["dirs"]:
+                self.tree.add(root, file_count, size)
+        self.matched += result["matched"]
+        self.total_size += result["total_size"]
+        for cat, (count, size) in result["categories"].items():
+            if cat not in self.categories:
+                self.categories[cat] = [0, 0]
+            self.categories[cat][0] += count
+            self.categories[cat][1] += size
+        if self.top_files is not None:
+            self.top_files.merge(result["top"])
+        elif self.keep_results:
+            shard = result["results"]
+            base = len(self.results.names)
+            self.results.merge(shard)
+            # Merged rows keep their order: the k-th live shard row is now row base + k.
+            live = shard.indices()
+            for k in heapq.nlargest(LEADERS, range(len(live)), key=lambda k: shard.sizes[live[k]]):
+                self.offer_leader(shard.sizes[live[k]], base + k)
+
+    def offer_leader(self, size: int, row: int) -> int:
+        """Track row among the largest rows; returns the size a row now has to exceed to get in."""
+        leaders = self.leaders
+        if len(leaders) < LEADERS:
+            heapq.heappush(leaders, (size, row))
+        elif size > leaders[0][0]:
+            heapq.heapreplace(leaders, (size, row))
+        return leaders[0][0] if len(leaders) >= LEADERS else -1
+
+    def leading_files(self) -> list:
+        """(path, size) of the largest files found so far, largest first."""
+        if self.top_files is not None:
+            return [(path, size) for size, path, _, _ in heapq.nlargest(LEADERS, list(self.top_files.overall))]
+        results = self.results
+        return [(results.path(row), size) for size, row in sorted(list(self.leaders), reverse=True)]
+
+    def live_summary(self) -> ScanSummary:
+        """The final summary, or mid-scan one built from the running counters and top files.
+
+        Safe to call from another thread while the walk runs: it copies the
+        small heaps and the category counters, and never reads the whole store.
+        """
+        if self.summary is not None:
+            return self.summary
+        categories = {cat: list(counts) for cat, counts in list(self.categories.items())}
+        return ScanSummary(self.results, categories, None, self.matched, self.total_size, self.leading_files())
+
+    def count_file(self, category: str, size: int):
+        self.matched += 1
+        self.total_size += size
+        if category not in self.categories:
+            self.categories[category] = [0, 0]
+        self.categories[category][0] += 1
+        self.categories[category][1] += size
+
+    def save_cache(self, prune: bool):
+        if self.cache is None:
+            return
+        try:
+            relisted = len(self.cache.updates)
+            self.cache.save(prune=prune)
+            logger.info(f"Scan cache: {self.cache.hits:,} directories reused, {relisted:,} re-listed")
+        except Exception as e:
+            logger.error(f"Failed to save scan cache: {e}")
+
+    def files_per_second(self) -> float:
+        return self.files_seen / self.walk_elapsed if self.walk_elapsed > 0 else 0.0
+
+
+class ScanSession:
+    """One run of a DiskScanner, identified by a generation number.
+
+    Each new scan gets a new session with the next generation. Worker
+    threads carry their session with them and every callback they queue for
+    the GUI checks it against the current one first, so a worker that
+    outlives a cancel or restart can never touch the newer scan's state.
+    cancel() trips the scanner's cancellation token; the scanner drops its
+    partial results as soon as its walk returns.
+    """
+    generations = itertools.count(1)
+
+    def __init__(self, scanner: DiskScanner):
+        self.generation = next(ScanSession.generations)
+        self.scanner = scanner
+
+    @property
+    def cancelled(self) -> bool:
+        return self.scanner.cancelled.is_set()
+
+    def cancel(self):
+        self.scanner.stop()
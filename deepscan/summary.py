@@ -0,0 +1,82 @@
+"""Precomputed overview of a scan, kept current as files are deleted."""
+
+TOP_N = 10  # Files and folders a summary reports.
+SLACK = 10  # Extra ones kept so a few deletions do not need a full re-rank.
+
+
+class ScanSummary:
+    """Totals, largest files, category breakdown and largest folders of one scan.
+
+    Built from the scanner's running counters and top files, so readers
+    (the analysis prompt, the chat context, the charts) only look up what
+    is already here instead of going over every row: DiskScanner keeps a
+    final one in summary once the walk ends, and live_summary() makes a
+    cheap one mid-scan. remove_file() keeps it current after a deletion
+    without a rescan.
+
+    A few more rows and folders than top_n are kept: deleting a file only
+    makes things smaller, so anything outside the kept set can never move
+    above it, and the set is only recomputed from scratch once deletions
+    leave fewer than top_n files in it, or shrink a kept folder below the
+    largest folder left out.
+    """
+
+    def __init__(self, results, categories: dict, tree=None, file_count: int = None, total_size: int = None,
+                 largest: list = None, top_n: int = TOP_N, slack: int = SLACK):
+        self.results = results
+        self.categories = categories  # category -> [count, total_size], shared with the scanner.
+        self.tree = tree
+        # A bounded scan's store holds only its top files, so the totals come from the scan's counters.
+        self.file_count = len(results) if file_count is None else file_count
+        self.total_size = results.total_size() if total_size is None else total_size
+        self.top_n = top_n
+        self.capacity = top_n + slack
+        # (path, size) of the largest files, largest first: the scanner's if given, else ranked from results.
+        self.top_files = self.rank_files() if largest is None else list(largest)
+        self.folders = []
+        self.folder_floor = 0  # Size of the largest folder not in self.folders.
+        self.rank_folders()
+
+    def rank_files(self) -> list:
+        results = self.results
+        return [(results.path(i), results.sizes[i]) for i in results.largest(self.capacity)]
+
+    def rank_folders(self):
+        tree = self.tree
+        if tree is None or not tree.finalized:
+            return
+        # One more than kept, plus the scan root, whose total is the whole scan.
+        ranked = [d for d in tree.largest(self.capacity + 2) if d != 0]
+        self.folders = ranked[:self.capacity]
+        self.folder_floor = tree.total_sizes[ranked[self.capacity]] if len(ranked) > self.capacity else 0
+
+    def largest_files(self, n: int = None) -> list:
+        """(path, size) of the n (at most top_n) largest files, largest first."""
+        return self.top_files[:self.top_n if n is None else min(n, self.top_n)]
+
+    def largest_folders(self, n: int = None) -> list:
+        """Directory ids of the n (at most top_n) folders holding the most data, scan root excluded."""
+        return self.folders[:self.top_n if n is None else min(n, self.top_n)]
+
+    def remove_file(self, path: str, index: int = None, size: int = None):
+        """Account for a deleted file: its row in results, if listed, or else its size on disk."""
+        results = self.results
+        if index is not None and results.alive[index]:
+            size = results.sizes[index]
+            counts = self.categories.get(results.category(index))
+            if counts is not None:
+                counts[0] -= 1
+                counts[1] -= size
+            results.remove(index)
+            self.file_count -= 1
+            self.total_size -= size
+            top_files = [entry for entry in self.top_files if entry[0] != path]
+            if len(top_files) != len(self.top_files):
+                self.top_files = top_files if len(top_files) >= self.top_n else self.rank_files()
+        if self.tree is not None and size is not None:
+            self.tree.remove_file(path, size)
+            if self.folders:
+                self.folders.sort(key=self.tree.total_sizes.__getitem__, reverse=True)
+                cutoff = self.folders[min(self.top_n, len(self.folders)) - 1]
+                if self.tree.total_sizes[cutoff] < self.folder_floor:
+                    self.rank_folders()
@@ -0,0 +1,152 @@
+"""Per-directory size aggregation for a whole scan (the treemap data model)."""
+import array
+import heapq
+import os
+
+
+class DirectoryTree:
+    """Cumulative size and file count for every directory a scan visited.
+
+    Every file listed counts, whatever min_file_size is, so the space taken
+    by many small files shows up too. Each directory is one row across
+    parallel columns: parent id (array 'i', -1 for the root), base name, and
+    its own and cumulative size and file count (array 'q'). Rows are added
+    from walker listings with add(); a directory's parents are created on
+    demand, so listings may arrive in any order, and a parent's id is always
+    lower than its children's. finalize() rolls the totals up in one reverse
+    pass and builds a compact child index with children sorted largest
+    first, after which the (parent id, name) -> id dict used while building
+    is dropped. Keying it by name rather than by full path means a path is
+    never stored, only the names already held in names.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.names = []
+        self.parents = array.array("i")
+        self.own_sizes = array.array("q")
+        self.own_files = array.array("q")
+        self.total_sizes = array.array("q")
+        self.total_files = array.array("q")
+        self.child_start = array.array("i")  # children of d are child_ids[child_start[d]:child_start[d + 1]]
+        self.child_ids = array.array("i")
+        self.index = {}  # (parent id, name) -> id, only while building.
+        self.finalized = False
+        self.prefix = os.path.join(self.root, "")  # Every path below the root starts with this.
+        self.new_directory(self.root, -1)
+
+    def __len__(self):
+        return len(self.names)
+
+    def new_directory(self, name: str, parent: int) -> int:
+        dir_id = len(self.names)
+        self.index[(parent, name)] = dir_id
+        self.names.append(name)
+        self.parents.append(parent)
+        self.own_sizes.append(0)
+        self.own_files.append(0)
+        return dir_id
+
+    def directory_id(self, path: str) -> int:
+        if path == self.root:
+            return 0
+        if not path.startswith(self.prefix):
+            raise ValueError(f"{path} is not under {self.root}")
+        index = self.index
+        dir_id = 0
+        for name in path[len(self.prefix):].split(os.sep):
+            if not name:
+                continue
+            child = index.get((dir_id, name))
+            dir_id = self.new_directory(name, dir_id) if child is None else child
+        return dir_id
+
+    def add(self, path: str, file_count: int, size: int):
+        """Record the files directly inside one directory."""
+        dir_id = self.directory_id(path)
+        self.own_files[dir_id] += file_count
+        self.own_sizes[dir_id] += size
+
+    def finalize(self):
+        n = len(self.names)
+        parents = self.parents
+        total_sizes = array.array("q", self.own_sizes)
+        total_files = array.array("q", self.own_files)
+        counts = [0] * (n + 1)
+        for dir_id in range(n - 1, 0, -1):
+            parent = parents[dir_id]
+            total_sizes[parent] += total_sizes[dir_id]
+            total_files[parent] += total_files[dir_id]
+            counts[parent + 1] += 1
+        for dir_id in range(n):
+            counts[dir_id + 1] += counts[dir_id]
+        child_ids = array.array("i", bytes(4 * (n - 1))) if n > 1 else array.array("i")
+        fill = counts[:]
+        for dir_id in range(1, n):
+            parent = parents[dir_id]
+            child_ids[fill[parent]] = dir_id
+            fill[parent] += 1
+        for dir_id in range(n):
+            start, end = counts[dir_id], counts[dir_id + 1]
+            if end - start > 1:
+                child_ids[start:end] = array.array("i", sorted(child_ids[start:end], key=total_sizes.__getitem__,
+                                                               reverse=True))
+        self.total_sizes = total_sizes
+        self.total_files = total_files
+        self.child_start = array.array("i", counts)
+        self.child_ids = child_ids
+        self.index = None
+        self.finalized = True
+
+    def path(self, dir_id: int) -> str:
+        parts = []
+        while dir_id > 0:
+            parts.append(self.names[dir_id])
+            dir_id = self.parents[dir_id]
+        return os.path.join(self.root, *reversed(parts))
+
+    def children(self, dir_id: int) -> array.array:
+        """Subdirectory ids of dir_id, largest cumulative size first."""
+        return self.child_ids[self.child_start[dir_id]:self.child_start[dir_id + 1]]
+
+    def find(self, path: str):
+        """Id of the directory at path, or None if the scan did not visit it."""
+        path = os.path.abspath(path)
+        if path == self.root:
+            return 0
+        rel = os.path.relpath(path, self.root)
+        if rel.startswith(os.pardir):
+            return None
+        dir_id = 0
+        for part in rel.split(os.sep):
+            if self.index is not None:
+                dir_id = self.index.get((dir_id, part))
+                if dir_id is None:
+                    return None
+                continue
+            for child in self.children(dir_id):
+                if self.names[child] == part:
+                    dir_id = child
+                    break
+            else:
+                return None
+        return dir_id
+
+    def largest(self, n: int, own: bool = False) -> list:
+        """Ids of the n directories with the most data, cumulative or directly inside (own=True)."""
+        sizes = self.own_sizes if own else self.total_sizes
+        return heapq.nlargest(n, range(len(self.names)), key=sizes.__getitem__)
+
+    def remove_file(self, path: str, size: int):
+        """Take a deleted file out of its directory and every ancestor."""
+        dir_id = self.find(os.path.dirname(path))
+        if dir_id is None:
+            return
+        self.own_sizes[dir_id] -= size
+        self.own_files[dir_id] -= 1
+        if not self.finalized:
+            return
+        while dir_id >= 0:
+            self.total_sizes[dir_id] -= size
+            self.total_files[dir_id] -= 1
+            dir_id = self.parents[dir_id]
@@ -0,0 +1,133 @@
+"""Squarified treemap layout over a DirectoryTree, independent of any GUI toolkit."""
+
+
+def worst_ratio(row_sum: float, row_min: float, row_max: float, side: float) -> float:
+    """Largest aspect ratio in a row of areas laid along a side of the given length."""
+    side2 = side * side
+    sum2 = row_sum * row_sum
+    return max(side2 * row_max / sum2, sum2 / (side2 * row_min))
+
+
+def squarify(sizes, x: float, y: float, width: float, height: float) -> list:
+    """Lay out positive sizes (sorted largest first) as (x, y, w, h) rectangles.
+
+    Bruls, Huizing and van Wijk's squarified algorithm: items are added to
+    a row along the shorter side of the remaining space for as long as that
+    does not make the row's worst aspect ratio worse, then the row is fixed
+    and the rest of the space is filled the same way. Rectangles come back
+    in the order of sizes and together cover the given area.
+    """
+    total = sum(sizes)
+    if total <= 0 or width <= 0 or height <= 0:
+        return [(x, y, 0.0, 0.0)] * len(sizes)
+    scale = width * height / total
+    areas = [size * scale for size in sizes]
+    rects = []
+    i, n = 0, len(areas)
+    while i < n:
+        side = min(width, height)
+        row_sum = row_min = row_max = areas[i]
+        worst = worst_ratio(row_sum, row_min, row_max, side)
+        j = i + 1
+        while j < n:
+            area = areas[j]
+            candidate = worst_ratio(row_sum + area, min(row_min, area), max(row_max, area), side)
+            if candidate > worst:
+                break
+            row_sum += area
+            row_min = min(row_min, area)
+            row_max = max(row_max, area)
+            worst = candidate
+            j += 1
+        if width >= height:
+            # A column along the left edge.
+            column = row_sum / height
+            cy = y
+            for area in areas[i:j]:
+                h = area / column
+                rects.append((x, cy, column, h))
+                cy += h
+            x += column
+            width -= column
+        else:
+            # A row along the top edge.
+            row = row_sum / width
+            cx = x
+            for area in areas[i:j]:
+                w = area / row
+                rects.append((cx, y, w, row))
+                cx += w
+            y += row
+            height -= row
+        i = j
+    return rects
+
+
+class TreemapLayout:
+    """Cached squarified layouts of the directories in a finalized DirectoryTree.
+
+    tiles(dir_id, width, height) lays out one level: each subdirectory, plus
+    one tile for the files directly inside dir_id. Children whose tile would
+    be smaller than min_area pixels are merged into a single "more" tile, so
+    a directory with thousands of small entries still costs only a handful
+    of rectangles. Layouts are relative to (0, 0) and cached per
+    (dir_id, width, height); a view draws as many levels as it needs by
+    asking for the layout of a child inside that child's tile, and resizing
+    or drilling back up reuses every layout computed before. Call clear()
+    after the tree's sizes change.
+    """
+
+    def __init__(self, tree, min_area: int = 64):
+        self.tree = tree
+        self.min_area = min_area
+        self.cache = {}  # (dir_id, width, height) -> list of tiles.
+
+    def clear(self):
+        self.cache = {}
+
+    def tiles(self, dir_id: int, width: int, height: int) -> list:
+        """Tiles of dir_id as (kind, dir_id, size, x, y, w, h), largest first.
+
+        kind is "dir" for a subdirectory (dir_id is the subdirectory), "files"
+        for the files directly inside the directory and "more" for the
+        merged small entries (dir_id is the directory itself for both).
+        """
+        key = (dir_id, width, height)
+        tiles = self.cache.get(key)
+        if tiles is not None:
+            return tiles
+        tree = self.tree
+        total_sizes = tree.total_sizes
+        total = total_sizes[dir_id]
+        items = []
+        if total > 0 and width > 0 and height > 0:
+            scale = width * height / total
+            min_size = self.min_area / scale
+            own = tree.own_sizes[dir_id]
+            rest = 0
+            placed_own = False
+            # Children are already sorted largest first; splice the own files in by size.
+            for child in tree.children(dir_id):
+                size = total_sizes[child]
+                if not placed_own and own >= size:
+                    placed_own = True
+                    if own >= min_size:
+                        items.append(("files", dir_id, own))
+                    else:
+                        rest += own
+                if size >= min_size:
+                    items.append(("dir", child, size))
+                else:
+                    rest += size
+            if not placed_own:
+                if own >= min_size:
+                    items.append(("files", dir_id, own))
+                else:
+                    rest += own
+            if rest > 0:
+                items.append(("more", dir_id, rest))
+            items = [item for item in items if item[2] > 0]
+        rects = squarify([item[2] for item in items], 0, 0, width, height)
+        tiles = [item + rect for item, rect in zip(items, rects)]
+        self.cache[key] = tiles
+        return tiles
@@ -0,0 +1,183 @@
+"""Directory walkers: single-threaded scandir, work-stealing parallel and the legacy os.walk walker."""
+import collections
+import os
+import queue
+import threading
+from pathlib import Path
+
+# -------------------- DIRECTORY WALKERS --------------------
+def list_directory(root, skip_dir=None, cache=None):
+    """List one directory with os.scandir.
+
+    Returns (dirs, files) where files holds (name, size, mtime) tuples taken
+    from the DirEntry stat data, or None if the directory cannot be read.
+    Subdirectories for which skip_dir(path) is true are left out. With a
+    ScanCache, an unchanged directory is served from the cache instead.
+    """
+    if cache is not None:
+        return cache.list_directory(root, skip_dir)
+    dirs = []
+    files = []
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if skip_dir is None or not skip_dir(entry.path):
+                            dirs.append(entry.name)
+                    elif entry.is_dir():
+                        # Symlinked directory; os.walk does not follow these either.
+                        continue
+                    else:
+                        st = entry.stat()
+                        files.append((entry.name, st.st_size, st.st_mtime))
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    return dirs, files
+
+
+def scandir_walk(top, skip_dir=None, cache=None):
+    """Walk a directory tree with os.scandir.
+
+    Yields (root, dirs, files) like os.walk, except that files is a list of
+    (name, size, mtime) tuples taken from the DirEntry stat data, so no Path
+    object or extra stat call is made per file. Directories for which
+    skip_dir(path) is true are pruned before they are listed.
+    """
+    top = os.fspath(top)
+    if skip_dir is not None and skip_dir(top):
+        return
+    stack = [top]
+    while stack:
+        root = stack.pop()
+        listing = list_directory(root, skip_dir, cache)
+        if listing is None:
+            continue
+        dirs, files = listing
+        yield root, dirs, files
+        stack.extend(os.path.join(root, d) for d in reversed(dirs))
+
+
+class ParallelWalker:
+    """Work-stealing, multi-threaded version of scandir_walk.
+
+    Every worker thread owns a deque of directories. It pushes the
+    subdirectories it finds onto its own deque and pops from the same end,
+    so each worker walks its part of the tree depth first; an idle worker
+    steals from the other end of a busy worker's deque, where the oldest
+    (and usually largest) subtrees sit. Listings reach the consumer one
+    directory at a time through a bounded queue, so merging results never
+    takes a lock per file.
+    """
+    IDLE_WAIT = 0.001
+
+    def __init__(self, top, skip_dir=None, workers=8, queue_size=1024, cache=None):
+        self.top = os.fspath(top)
+        self.skip_dir = skip_dir
+        self.cache = cache
+        self.workers = max(1, int(workers))
+        self.results = queue.Queue(maxsize=queue_size)
+        self.deques = [collections.deque() for _ in range(self.workers)]
+        self.outstanding = 0  # Directories queued or being listed.
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.stopped = threading.Event()
+
+    def __iter__(self):
+        if self.skip_dir is not None and self.skip_dir(self.top):
+            return
+        self.outstanding = 1
+        self.deques[0].append(self.top)
+        threads = [threading.Thread(target=self.work, args=(i,), daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        finished = 0
+        try:
+            while finished < self.workers:
+                item = self.results.get()
+                if item is None:
+                    finished += 1
+                else:
+                    yield item
+        finally:
+            # Also reached when the consumer stops iterating early.
+            self.stopped.set()
+
+    def next_directory(self, index):
+        own = self.deques[index]
+        try:
+            return own.pop()
+        except IndexError:
+            pass
+        for offset in range(1, self.workers):
+            victim = self.deques[(index + offset) % self.workers]
+            try:
+                return victim.popleft()
+            except IndexError:
+                continue
+        return None
+
+    def publish(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def work(self, index):
+        own = self.deques[index]
+        try:
+            while not self.stopped.is_set() and not self.done.is_set():
+                root = self.next_directory(index)
+                if root is None:
+                    self.done.wait(self.IDLE_WAIT)
+                    continue
+                listing = list_directory(root, self.skip_dir, self.cache)
+                if listing is not None:
+                    dirs, files = listing
+                    if dirs:
+                        # Count the children before they become stealable.
+                        with self.lock:
+                            self.outstanding += len(dirs)
+                        own.extend(os.path.join(root, d) for d in dirs)
+                    if not self.publish((root, dirs, files)):
+                        break
+                with self.lock:
+                    self.outstanding -= 1
+                    if self.outstanding == 0:
+                        self.done.set()
+        finally:
+            self.publish(None)
+
+
+def parallel_walk(top, skip_dir=None, workers=8, cache=None):
+    """Functional wrapper around ParallelWalker with the SCAN_ENGINES signature."""
+    return iter(ParallelWalker(top, skip_dir, workers, cache=cache))
+
+
+def legacy_walk(top, skip_dir=None):
+    """The original os.walk + Path.stat() walker, kept for comparison runs."""
+    for root, dirs, filenames in os.walk(top):
+        if skip_dir is not None and skip_dir(root):
+            dirs[:] = []
+            continue
+        files = []
+        for filename in filenames:
+            try:
+                st = (Path(root) / filename).stat()
+            except (PermissionError, OSError):
+                continue
+            files.append((filename, st.st_size, st.st_mtime))
+        yield root, dirs, files
+
+
+SCAN_ENGINES = {
+    "scandir": scandir_walk,
+    "walk": legacy_walk,
+    "parallel": parallel_walk,
+}
@@ -0,0 +1,64 @@
+import os
+
+from deepscan.cache import ScanCache
+from deepscan.scanner import DiskScanner
+
+
+def scan_sizes(root, db_path, min_file_size):
+    scanner = DiskScanner(min_file_size=min_file_size, engine="scandir", skip_system_dirs=False,
+                          cache=ScanCache(db_path))
+    results = scanner.scan(root)
+    return {results.names[i]: results.sizes[i] for i in results.indices()}, scanner.cache.hits
+
+
+def test_file_grown_in_place_is_restated(tmp_path):
+    root = tmp_path / "data"
+    root.mkdir()
+    (root / "disk.img").write_bytes(b"x" * 2000)
+    (root / "small.txt").write_bytes(b"x" * 10)
+    # An old directory mtime, so its listing is cached rather than treated as still changing.
+    os.utime(root, (1_000_000_000, 1_000_000_000))
+    db_path = str(tmp_path / "cache.db")
+
+    sizes, hits = scan_sizes(str(root), db_path, 1000)
+    assert sizes == {"disk.img": 2000}
+    assert hits == 0
+
+    with open(root / "disk.img", "ab") as f:
+        f.write(b"x" * 3000)
+    os.utime(root, (1_000_000_000, 1_000_000_000))
+
+    sizes, hits = scan_sizes(str(root), db_path, 1000)
+    assert hits == 1
+    assert sizes == {"disk.img": 5000}
+
+
+def test_counting_pass_does_not_skew_the_scan(tmp_path):
+    root = tmp_path / "data"
+    for name in ("a", "b", "c"):
+        (root / name).mkdir(parents=True)
+        (root / name / "file.bin").write_bytes(b"x" * 100)
+    for path in (root / "a", root / "b", root / "c", root):
+        os.utime(path, (1_000_000_000, 1_000_000_000))
+    db_path = str(tmp_path / "cache.db")
+    scan_sizes(str(root), db_path, 0)
+
+    # Two-pass scan on one cache: the count walks every directory, then the scan walks them again.
+    scanner = DiskScanner(engine="scandir", skip_system_dirs=False, cache=ScanCache(db_path))
+    assert scanner.count_files(str(root)) == 3
+    assert scanner.cache.hits == 4
+    scanner.scan(str(root))
+    assert scanner.cache.hits == 4
+    assert len(scanner.cache.seen) == 4
+
+
+def test_save_makes_the_next_load_reread(tmp_path):
+    root = tmp_path / "data"
+    root.mkdir()
+    (root / "file.bin").write_bytes(b"x" * 100)
+    os.utime(root, (1_000_000_000, 1_000_000_000))
+    cache = ScanCache(str(tmp_path / "cache.db"))
+    for expected_hits in (0, 1):
+        scanner = DiskScanner(engine="scandir", skip_system_dirs=False, cache=cache)
+        scanner.scan(str(root))
+        assert cache.hits == expected_hits
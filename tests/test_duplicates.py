@@ -0,0 +1,17 @@
+import os
+
+from deepscan.duplicates import find_duplicates
+from deepscan.scanner import DiskScanner
+
+
+def test_hard_links_are_represented_by_their_first_path(tmp_path):
+    data = os.urandom(20000)
+    (tmp_path / "original.bin").write_bytes(data)
+    for name in ("z-link.bin", "b-link.bin", "a-link.bin"):
+        os.link(tmp_path / "original.bin", tmp_path / name)
+    (tmp_path / "copy.bin").write_bytes(data)
+    results = DiskScanner(engine="scandir", skip_system_dirs=False).scan(str(tmp_path))
+
+    expected = [(20000, [str(tmp_path / "a-link.bin"), str(tmp_path / "copy.bin")])]
+    for _ in range(5):
+        assert find_duplicates(results, workers=8) == expected
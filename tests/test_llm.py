@@ -0,0 +1,189 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from deepscan.llm import LLMProvider, OllamaProvider, ResponseCache, generate_concurrently
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Answers /api/generate like Ollama; failures and hangs are set on the server."""
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is visible.
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            server.client_ports.add(self.client_address[1])
+            failing = server.failures > 0
+            if failing:
+                server.failures -= 1
+        if server.hang.is_set():
+            server.release.wait(5)
+            return
+        time.sleep(server.delay)
+        if failing:
+            status, data = 503, {"error": "model is loading"}
+        else:
+            status, data = 200, {"response": "echo " + body["prompt"], "done": True}
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.client_ports = set()
+    server.failures = 0
+    server.delay = 0
+    server.hang = threading.Event()
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def provider_for(server, **kwargs):
+    host, port = server.server_address
+    return OllamaProvider("stub", f"http://{host}:{port}", backoff=0.01, **kwargs)
+
+
+def test_requests_reuse_one_connection(server):
+    provider = provider_for(server)
+    try:
+        answers = [provider.generate(str(i)) for i in range(5)]
+    finally:
+        provider.close()
+    assert answers == [f"echo {i}" for i in range(5)]
+    assert server.requests == 5
+    assert len(server.client_ports) == 1
+
+
+def test_503_is_retried_until_it_succeeds(server):
+    server.failures = 2
+    provider = provider_for(server, retries=3)
+    try:
+        assert provider.generate("hello") == "echo hello"
+    finally:
+        provider.close()
+    assert server.requests == 3
+
+
+def test_503_gives_up_after_retries(server):
+    server.failures = 100
+    provider = provider_for(server, retries=3)
+    try:
+        with pytest.raises(requests.HTTPError) as error:
+            provider.generate("hello")
+    finally:
+        provider.close()
+    assert error.value.response.status_code == 503
+    assert server.requests == 4  # The first attempt plus three retries.
+
+
+def test_hanging_server_times_out_without_resending(server):
+    server.hang.set()
+    provider = provider_for(server, read_timeout=0.5, retries=3)
+    start = time.perf_counter()
+    try:
+        # urllib3 gives up at once (no read retries), which requests reports as a ConnectionError.
+        with pytest.raises((requests.ConnectionError, requests.Timeout)):
+            provider.generate("hello")
+    finally:
+        provider.close()
+    assert time.perf_counter() - start < 2
+    assert server.requests == 1
+
+
+def test_refused_connection_fails():
+    # Bind and close a socket to get a port nobody listens on.
+    probe = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    host, port = probe.server_address
+    probe.server_close()
+    provider = OllamaProvider("stub", f"http://{host}:{port}", backoff=0.01, retries=2)
+    try:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            provider.generate("hello")
+    finally:
+        provider.close()
+
+
+def test_generate_concurrently_overlaps_requests(server):
+    server.delay = 0.5
+    providers = [provider_for(server), provider_for(server)]
+    jobs = [(providers[i % 2], f"job {i}") for i in range(4)]
+    start = time.perf_counter()
+    try:
+        answers = asyncio.run(generate_concurrently(jobs))
+    finally:
+        for provider in providers:
+            provider.close()
+    assert answers == [f"echo job {i}" for i in range(4)]
+    assert server.requests == 4
+    assert time.perf_counter() - start < 1.5  # Four 0.5 s requests, not run one after another.
+
+
+def test_generate_concurrently_returns_errors_in_place(server):
+    server.failures = 1
+    provider = provider_for(server, retries=0)
+    try:
+        answers = asyncio.run(generate_concurrently([(provider, "first"), (provider, "second")]))
+    finally:
+        provider.close()
+    errors = [answer for answer in answers if isinstance(answer, requests.HTTPError)]
+    assert len(errors) == 1
+    assert "echo first" in answers or "echo second" in answers
+
+
+def test_provider_without_generate_cannot_be_created():
+    class Incomplete(LLMProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("model")
+
+
+def test_response_cache_keys_servers_apart(tmp_path):
+    cache = ResponseCache(str(tmp_path / "ai_cache.db"))
+    try:
+        first = ResponseCache.key("openai", "http://box-a:8000/v1", "local-model", "prompt")
+        second = ResponseCache.key("openai", "http://box-b:8000/v1", "local-model", "prompt")
+        assert first != second
+        cache.put(first, "answer from box A")
+        assert cache.get(first)[0] == "answer from box A"
+        assert cache.get(second) is None
+    finally:
+        cache.close()
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "ai_cache.db"), max_entries=2)
+    try:
+        cache.put("a", "A")
+        time.sleep(0.01)
+        cache.put("b", "B")
+        time.sleep(0.01)
+        assert cache.get("a") is not None  # Now "b" is the least recently used.
+        time.sleep(0.01)
+        cache.put("c", "C")
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+    finally:
+        cache.close()
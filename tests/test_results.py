@@ -0,0 +1,55 @@
+from deepscan.results import ResultFilter, ScanResults
+
+
+def make_store(count):
+    results = ScanResults()
+    dir_id = results.directory_id("/data")
+    for i in range(count):
+        results.add(dir_id, f"file{i:03}.log", 1000 + i, 0.0, "Logs")
+    return results
+
+
+def listed(sections):
+    return [row for _, rows in sections for row in rows]
+
+
+def test_query_sees_rows_added_after_first_query():
+    results = make_store(100)
+    result_filter = ResultFilter(results)
+    assert len(listed(result_filter.query("", "Size (Desc)"))) == 100
+    assert len(listed(result_filter.query("file0", "Size (Desc)"))) == 100
+
+    dir_id = results.directory_id("/data")
+    for i in range(10):
+        results.add(dir_id, f"late{i}.log", 5000 + i, 0.0, "Logs")
+
+    rows = listed(result_filter.query("", "Size (Desc)"))
+    assert len(rows) == 110
+    assert results.names[rows[0]] == "late9.log"
+
+
+def test_narrow_filter_matches_new_rows():
+    results = make_store(100)
+    result_filter = ResultFilter(results)
+    assert listed(result_filter.query("late", "Name (Asc)")) == []
+
+    dir_id = results.directory_id("/data")
+    results.add(dir_id, "late.log", 1, 0.0, "Logs")
+
+    rows = listed(result_filter.query("late", "Name (Asc)"))
+    assert [results.names[i] for i in rows] == ["late.log"]
+
+
+def test_query_ignores_a_row_still_being_added():
+    results = make_store(10)
+    # What another thread leaves behind half-way through add(): every column but alive.
+    results.sizes.append(99999)
+    results.mtimes.append(0.0)
+    results.cat_ids.append(results.category_id("Logs"))
+    results.dir_ids.append(results.directory_id("/data"))
+    results.names.append("partial.log")
+    for text in ("", "file", "log"):
+        for sort_order in ("Name (Asc)", "Size (Desc)"):
+            rows = listed(ResultFilter(results).query(text, sort_order))
+            assert len(rows) == 10
+            assert all(i < 10 for i in rows)
@@ -0,0 +1,45 @@
+import os
+
+from deepscan.scanner import DiskScanner
+
+
+def make_tree(root):
+    # 48 files of distinct sizes in no particular order, so rankings have no ties.
+    for d in range(6):
+        folder = root / f"dir{d}"
+        folder.mkdir()
+        for f in range(8):
+            (folder / f"file{f}.bin").write_bytes(b"x" * ((d * 8 + f + 1) * 7919 % 4001))
+    return str(root)
+
+
+def brute_force_largest(results, n):
+    return [(results.path(i), results.sizes[i]) for i in results.largest(n)]
+
+
+def test_live_summary_mid_scan_matches_the_store(tmp_path):
+    scanner = DiskScanner(engine="scandir", skip_system_dirs=False)
+    files = scanner.iter_files(make_tree(tmp_path))
+    for _ in range(20):
+        next(files)
+    summary = scanner.live_summary()
+    assert summary.file_count == len(scanner.results) == 20
+    assert summary.total_size == scanner.results.total_size()
+    assert summary.largest_files() == brute_force_largest(scanner.results, 10)
+    files.close()
+
+
+def test_summary_follows_deletions(tmp_path):
+    for kwargs in ({}, {"top_k": 15}, {"engine": "process", "processes": 2}):
+        scanner = DiskScanner(skip_system_dirs=False, **{"engine": "scandir", **kwargs})
+        root = tmp_path / str(len(os.listdir(tmp_path)))
+        root.mkdir()
+        results = scanner.scan(make_tree(root))
+        summary = scanner.summary
+        assert summary.largest_files() == brute_force_largest(results, 10)
+        for _ in range(15):
+            path, size = summary.largest_files(1)[0]
+            summary.remove_file(path, results.find(path))
+            assert summary.largest_files() == brute_force_largest(results, 10)
+        tree = scanner.tree
+        assert summary.largest_folders(3) == [d for d in tree.largest(4) if d != 0][:3]